@@ -711,16 +711,39 @@
 
 
 
-import os, json, pandas as pd, openai
+import os, re, orjson, csv, pandas as pd, numpy as np, openai, asyncio, time, random, ijson, hashlib, shelve, queue, threading
 # Azure OpenAI Configuration
 AZURE_OAI_KEY = "EzqbdX8l2m0PzedkWSxkjESB5wGGDseac0Aq8SmfthOIqZ6jweNQJQQJ99BCACYeBjFXJ3w3AAABACOG5ZKu"
 AZURE_OAI_MODEL = "gpt-4o"
 AZURE_OPENAI_ENDPOINT = "https://qmig-open-ai.openai.azure.com/"
-AZURE_OPENAI_VERSION = "2023-08-01-preview"
-
-
-# Initialize OpenAI client
-client = openai.AzureOpenAI(
+AZURE_OPENAI_VERSION = "2024-10-21"  # The Batch API needs 2024-07-01-preview or later
+
+
+# Maximum number of batch requests in flight at once (keeps us under the deployment's RPM limit)
+MAX_CONCURRENT_REQUESTS = 10
+# Submit every table's batches as one offline Batch API job (50% cheaper, separate quota, <24h turnaround).
+# Requires AZURE_OAI_MODEL to be a Global Batch deployment.
+USE_BATCH_API = False
+BATCH_POLL_INTERVAL = 60  # Seconds between Batch API status checks
+# Upper bound on records requested per call; fewer, larger calls free RPM headroom (4 calls per 100 records).
+# Wide tables get fewer (see batch_size_for) so that a whole batch fits in the model's output limit.
+RECORDS_PER_BATCH = 25
+MAX_OUTPUT_TOKENS = 16384  # gpt-4o's completion limit
+TOKENS_PER_FIELD = 12  # Rough output cost of one "column": value pair, key included
+MAX_TOPUP_ROUNDS = 3  # Extra rounds for batches that failed before giving up on a table
+TOTAL_RECORDS = 100  # Records generated per table
+DISTRIBUTION_TOP_K = 20  # Most frequent values listed per column in the prompt; the long tail adds tokens, not signal
+# Pause new requests when the deployment reports fewer remaining requests/tokens than this
+MIN_REMAINING_REQUESTS = 2
+MIN_REMAINING_TOKENS = 5000
+# Reuse generated batches across runs and tables with the same structure (same columns and dtypes).
+# Off by default: cached records are served verbatim, so two tables sharing a structure also share key values.
+# Delete the shelve files to force fresh data.
+USE_GENCACHE = False
+GENCACHE_PATH = "generated_test_data_cache"
+
+# Initialize OpenAI client (async so that the batches of a table run concurrently)
+client = openai.AsyncAzureOpenAI(
     api_key=AZURE_OAI_KEY,
     api_version=AZURE_OPENAI_VERSION,
     azure_endpoint=AZURE_OPENAI_ENDPOINT,
@@ -732,8 +755,16 @@ input_files = [file for file in os.listdir(files)]
 output_dir = "generated_test_data_w"
 os.makedirs(output_dir, exist_ok=True)
 
-# Read all tables into DataFrames
-tables = {file.lower(): pd.read_csv(files + '/' + file) for file in input_files}
+# Read all tables into Arrow-backed DataFrames (much smaller than object-dtype strings, native hashing for value_counts).
+# Every table is loaded, not only the ones being generated, because relationship inference needs all of them.
+tables = {file.lower(): pd.read_csv(files + '/' + file, engine="pyarrow", dtype_backend="pyarrow") for file in input_files}
+
+# A primary key candidate has no missing and no repeated values. Most columns repeat early, so a small
+# prefix is checked first and the full hash pass only runs for columns that survive it.
+def is_unique_column(s):
+    if s.hasnans or not s.iloc[:1000].is_unique:
+        return False
+    return s.is_unique
 
 # Function to infer primary and foreign key relationships
 def infer_relationships(tables):
@@ -743,14 +774,24 @@ def infer_relationships(tables):
     # Identify primary keys (columns with unique values)
     for table_name, df in tables.items():
         for col in df.columns:
-            if df[col].nunique() == len(df):  # Column has unique values
-                primary_keys[(table_name, col)] = df[col].tolist()
+            if is_unique_column(df[col]):  # Column has unique values
+                # Build the lookups once; they are reused by every foreign key test below.
+                # Numeric keys are matched with np.isin on the array, everything else through the hash set.
+                pk_array = df[col].to_numpy()
+                primary_keys[(table_name, col)] = (df[col].dtype, pk_array, frozenset(pk_array.tolist()))
 
     # Identify foreign keys (columns matching primary keys in other tables)
     for table_name, df in tables.items():
         for col in df.columns:
-            for (pk_table, pk_col), pk_values in primary_keys.items():
-                if col != pk_col and df[col].isin(pk_values).sum() > len(df) * 0.8:  # 80% match
+            for (pk_table, pk_col), (pk_dtype, pk_array, pk_set) in primary_keys.items():
+                # Skip same-named columns (as before) and pairs whose dtypes differ
+                if col == pk_col or df[col].dtype != pk_dtype:
+                    continue
+                if pk_dtype.kind in "iuf":
+                    matches = np.isin(df[col].dropna().to_numpy(), pk_array).sum()
+                else:
+                    matches = df[col].map(pk_set.__contains__).sum()
+                if matches > len(df) * 0.8:  # 80% match
                     relationships.append({
                         "table": table_name,
                         "column": col,
@@ -760,99 +801,395 @@ def infer_relationships(tables):
 
     return relationships
 
+# Serialize a table's columns, sample rows and value distributions; these do not change between batches
+# Distribution of one column for the prompt: the top values and their shares, or only a range summary for
+# high-cardinality columns (ids, timestamps) whose full value_counts would dominate the prompt.
+def column_distribution(s):
+    counts = s.value_counts(normalize=True)
+    if len(counts) > len(s) * 0.5:
+        return {"min": s.min(), "max": s.max(), "nunique": len(counts)}
+    # Keys are stringified: orjson only accepts str keys and the pyarrow engine parses dates into timestamps
+    return {str(value): share for value, share in counts.head(DISTRIBUTION_TOP_K).items()}
+
+# Each table's block is computed once per run and shared by top-up rounds and the Batch API path.
+schema_blocks = {}
+
+def build_schema_block(table_name, table_df):
+    if table_name not in schema_blocks:
+        # Timestamps go through str() (passthrough) so sample rows, ranges and distribution keys share one format
+        schema_blocks[table_name] = orjson.dumps({"file_name": table_name, "schema": {
+            "columns": list(table_df.columns),
+            "sample_data": table_df.head(5).to_dict(orient="records"),
+            "column_distributions": {col: column_distribution(table_df[col]) for col in table_df.columns}
+        }}, default=str, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME).decode()
+    return schema_blocks[table_name]
+
+# Build the generation prompt for a table from its precomputed schema block.
+# The large invariant blocks come first (relationships are shared by every table) so that Azure's prompt
+# cache can reuse the prefix; the small request-specific instructions come last.
+def build_prompt(table_name, schema_block, detected_relationships_json, records_per_batch):
+    return f"""
+    Detected Relationships:
+    {detected_relationships_json}
+
+    Table Structure & Data Patterns:
+    {schema_block}
+
+    The above is a related SQL table '{table_name}' stored in an Excel file, with its structure and inferred relationships.
+
+    **Task:** Generate {records_per_batch} unique test records for the table while preserving the same format as the input file.
+    - Make sure Keep the same column names and data types.
+    - Maintain primary key uniqueness and foreign key relationships.
+    - Distribute values similarly to the original dataset but ensure that the generated values do not match any existing values in the input files.
+    - Ensure the generated data is different from all previously generated data
+    - Return the output as a complete and valid JSON object with this structure: {{ {table_name}: [{{column1: value, column2: value, ...}}] }}. Ensure the response is properly closed and contains all necessary brackets and commas.
+    """
+
+# Records per batch for a table: as many as fit in three quarters of the output limit, at most RECORDS_PER_BATCH
+def batch_size_for(table_df):
+    per_record = max(len(table_df.columns), 1) * TOKENS_PER_FIELD
+    return max(1, min(RECORDS_PER_BATCH, MAX_OUTPUT_TOKENS * 3 // 4 // per_record))
+
+# The table's prompt is built once; only the batch id is appended per request. Concurrent batches of a table do not
+# see each other's output, so the id tells the model which slice of new records this request is for.
+def batch_prompt(prompt, batch_id):
+    return prompt + f"- This is batch {batch_id + 1}; make these records distinct from those of the other batches.\n"
+
+# Cache key for a table structure: column names (case-insensitive) and dtypes, so renamed copies of a table share entries.
+# Each batch slot of a run has its own entry, so one run never gets the same cached records twice.
+def gencache_key(table_df, slot):
+    schema = sorted((str(col).strip().lower(), str(dtype)) for col, dtype in table_df.dtypes.items())
+    return hashlib.sha1(orjson.dumps(schema)).hexdigest() + f":{slot}"
+
+# Cached batches are stored as templates keyed by the normalized column name; fill in this table's column names.
+# Returns None on a miss or when the template does not cover exactly this table's columns.
+def gencache_lookup(table_df, slot):
+    with shelve.open(GENCACHE_PATH) as cache:
+        templates = cache.get(gencache_key(table_df, slot))
+    if not templates:
+        return None
+    columns = {str(col).strip().lower(): col for col in table_df.columns}
+    if any(set(template) != set(columns) for template in templates):
+        return None
+    return [{columns[key]: value for key, value in template.items()} for template in templates]
+
+def gencache_store(table_df, slot, records):
+    columns = {str(col): str(col).strip().lower() for col in table_df.columns}
+    if any(not isinstance(record, dict) or set(record) != set(columns) for record in records):
+        return  # Only cache batches that match the table's columns exactly
+    with shelve.open(GENCACHE_PATH) as cache:
+        cache[gencache_key(table_df, slot)] = [{columns[col]: value for col, value in record.items()} for record in records]
+
+# Parse a rate-limit reset/retry-after header ("12", "1s", "6m0s", "20ms") into seconds
+def parse_reset(value):
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(amount) * units[unit] for amount, unit in re.findall(r"([\d.]+)(ms|s|m|h)", value))
+
+# Monotonic time before which no new request is sent; shared by all concurrent batches
+pause_until = 0.0
+
+# Exponential backoff with jitter so concurrent batches do not retry in lockstep
+def backoff_delay(attempt):
+    return min(60 * 2 ** attempt, 600) + random.uniform(0, 5)
+
+# Stream a chat completion, pacing from the rate-limit headers the server returns instead of a fixed sleep.
+# Records under the table's key are parsed incrementally as the tokens arrive; returns (response_text, records).
+# Only rate limits, timeouts and dropped connections are retried; anything else (bad request, malformed JSON) fails fast.
+async def create_completion(messages, table_name, max_attempts=5):
+    global pause_until
+    for attempt in range(max_attempts):
+        delay = pause_until - time.monotonic()
+        if delay > 0:
+            print(f"Rate limit nearly exhausted, waiting {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+        try:
+            raw_response = await client.chat.completions.with_raw_response.create(
+                model=AZURE_OAI_MODEL,
+                temperature=0.7,
+                messages=messages,
+                response_format={"type": "json_object"},
+                timeout=600,
+                stream=True,
+                stream_options={"include_usage": True}
+            )
+        except openai.RateLimitError as e:
+            if attempt == max_attempts - 1:
+                raise
+            # Wait exactly as long as the server asks rather than a worst-case constant
+            retry_after = parse_reset(e.response.headers.get("retry-after")) or backoff_delay(attempt)
+            print(f"Rate limit error encountered. Retrying in {retry_after:.1f} seconds...")
+            pause_until = max(pause_until, time.monotonic() + retry_after)
+            continue
+        except (openai.APITimeoutError, openai.APIConnectionError) as e:
+            if attempt == max_attempts - 1:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"{type(e).__name__} for {table_name}. Retrying in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+            continue
+
+        headers = raw_response.headers
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        if remaining_requests is not None and int(remaining_requests) < MIN_REMAINING_REQUESTS:
+            pause_until = max(pause_until, time.monotonic() + (parse_reset(headers.get("x-ratelimit-reset-requests")) or 1.0))
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None and int(remaining_tokens) < MIN_REMAINING_TOKENS:
+            pause_until = max(pause_until, time.monotonic() + (parse_reset(headers.get("x-ratelimit-reset-tokens")) or 1.0))
+
+        stream = raw_response.parse()
+        records = ijson.sendable_list()
+        parser = ijson.items_coro(records, f"{table_name}.item", use_float=True)
+        chunks = []
+        try:
+            async for chunk in stream:
+                if chunk.usage and chunk.usage.prompt_tokens_details:
+                    # Confirms how much of the prompt prefix was served from Azure's prompt cache
+                    print(f"Prompt tokens: {chunk.usage.prompt_tokens}, cached: {chunk.usage.prompt_tokens_details.cached_tokens}")
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    chunks.append(delta)
+                    parser.send(delta.encode())  # Raises ijson.JSONError as soon as the output is malformed
+            parser.close()
+        except ijson.JSONError:
+            # Not retried here; keep the tail of the raw output for diagnosis
+            print(f"Malformed response for {table_name}: ...{''.join(chunks)[-500:]}")
+            raise
+        except (openai.APITimeoutError, openai.APIConnectionError) as e:
+            # The connection dropped mid-stream; the partial batch is discarded and requested again
+            if attempt == max_attempts - 1:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"{type(e).__name__} while streaming {table_name}. Retrying in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+            continue
+        finally:
+            await stream.close()
+        return "".join(chunks), list(records)
+
 # Function to generate data for a single table in batches, using all previous data
-def generate_data_for_table(all_generated_data,conversation_history, table_name, table_df, detected_relationships, records_per_batch=10, total_records=100):
+# Each merged batch is queued for the CSV writer thread right away, so a crash loses at most the batches in flight.
+async def generate_data_for_table(semaphore, all_generated_data, conversation_history, table_name, table_df, detected_relationships_json, output_path, records_per_batch=None, total_records=TOTAL_RECORDS, topup_round=0, first_slot=None):
+    records_per_batch = records_per_batch or batch_size_for(table_df)
     # all_generated_data = []  # List to store all generated data
     # Keep track of all previous batches' records
     
-    # Number of batches we need
-    num_batches = total_records // records_per_batch
+    # Number of batches we need for the records still missing
+    num_batches = -(-(total_records - len(all_generated_data)) // records_per_batch)
     print('num_batches:', num_batches)
-    for batch_num in range(num_batches):
-        print('batch_num:', batch_num)
+    # Batches of this table run concurrently, so each one sees the history as it was when the table started
+    history_prefix = list(conversation_history)
+    # The prompt only differs by batch id between batches, so build it (and its value_counts) once
+    table_prompt = build_prompt(table_name, build_schema_block(table_name, table_df), detected_relationships_json, records_per_batch)
 
-        prompt = f"""
-        I have a related SQL table '{table_name}' stored in an Excel file. The table has the following structure and inferred relationships.
-
-        Detected Relationships:
-        {json.dumps(detected_relationships, indent=2)}
-
-        Table Structure & Data Patterns:
-        {{ "file_name": "{table_name}", "schema": {{
-            "columns": {json.dumps(list(table_df.columns))},
-            "sample_data": {json.dumps(table_df.head(5).to_dict(orient="records"))},
-            "column_distributions": {json.dumps({col: table_df[col].value_counts(normalize=True).to_dict() for col in table_df.columns})}
-        }} }}
-
-        **Task:** Generate {records_per_batch} unique test records for the table while preserving the same format as the input file.
-        - Make sure Keep the same column names and data types.
-        - Maintain primary key uniqueness and foreign key relationships.
-        - Distribute values similarly to the original dataset but ensure that the generated values do not match any existing values in the input files.
-        - Ensure the generated data is different from all previously generated data
-        - Return the output as a complete and valid JSON object with this structure: {{ {table_name}: [{{column1: value, column2: value, ...}}] }}. Ensure the response is properly closed and contains all necessary brackets and commas.
-        """
-        conversation_history.append({"role": "user", "content": prompt})
+    # Slots already written by an interrupted run are skipped on resume; top-up rounds continue after the
+    # last slot requested, so a slot (and its cache entry) is used at most once per run
+    if first_slot is None:
+        first_slot = len(all_generated_data) // records_per_batch
+
+    async def run_batch(batch_num):
+        print('batch_num:', batch_num)
+        slot = first_slot + batch_num
+        prompt = batch_prompt(table_prompt, slot)
+        if USE_GENCACHE:
+            new_records = gencache_lookup(table_df, slot)
+            if new_records is not None:
+                print(f"Reusing cached batch {slot} for {table_name}")
+                return prompt, orjson.dumps({table_name: new_records}).decode(), new_records
         
         # Send the prompt to OpenAI API
         try:
-            response = client.chat.completions.create(
-                model=AZURE_OAI_MODEL,
-                temperature=0.7,
-                messages=conversation_history,
-                response_format={"type": "json_object"},
-                timeout=600
-            )
+            async with semaphore:
+                response_text, new_records = await create_completion(history_prefix + [{"role": "user", "content": prompt}], table_name)
+        except ijson.JSONError as e:
+            # The stream is abandoned at the first malformed token
+            print(f"JSON decode error for {table_name}: {e}")
+            return prompt, None, None
+        if USE_GENCACHE:
+            gencache_store(table_df, slot, new_records)
+        return prompt, response_text, new_records
+
+    results = await asyncio.gather(*[run_batch(batch_num) for batch_num in range(num_batches)], return_exceptions=True)
+
+    # Merge the batches in order so the conversation history stays deterministic
+    for batch_num, result in enumerate(results):
+        if writer_error is not None:
+            # Records queued now would never reach the file
+            print(f"Writing {output_path} failed: {writer_error}")
+            return None, conversation_history
+        if isinstance(result, Exception):
+            print(f"Error generating data for {table_name} (batch {batch_num+1}): {result}")
+            return None, conversation_history
+        prompt, response_text, new_records = result
+        if new_records is None:
+            continue
+        print(len(new_records), ' Length of Batch Records')
+        # Add the new batch of records to all generated data, without overshooting the requested total
+        new_records = new_records[:total_records - len(all_generated_data)]
+        all_generated_data.extend(new_records)
+        write_queue.put((output_path, list(table_df.columns), new_records))
+        conversation_history.append({"role": "user", "content": prompt})
+        conversation_history.append({"role": "assistant", "content": response_text})
 
-            response_text = response.choices[0].message.content
-            # Parse the response
-            try:
-                generated_data = json.loads(response_text)
-                new_records = generated_data[table_name]  # Extract the batch of records
-                print(len(new_records), ' Length of Batch Records')
-                # Add the new batch of records to all generated data
-                all_generated_data.extend(new_records)
-                conversation_history.append({"role": "assistant", "content": response_text})
-                # Ensure we only generate the desired number of records
-                if len(all_generated_data) >= total_records:
-                    break
-
-            except json.JSONDecodeError as e:
-                print(f"JSON decode error for {table_name}: {e}")
-                continue
-                # return None
-
-        except Exception as e:
-            print(f"Error generating data for {table_name} (batch {batch_num+1}): {e}")
-            return None
     if len(all_generated_data) < total_records:
+        if topup_round >= MAX_TOPUP_ROUNDS:
+            # Batches keep failing (e.g. truncated output); stop instead of retrying forever
+            print(f"Giving up on {table_name} after {MAX_TOPUP_ROUNDS} top-up rounds with {len(all_generated_data)} of {total_records} records")
+            return None, conversation_history
         print('Attempted to generate less records than requested')
-        generated_data, conversation_history = generate_data_for_table(all_generated_data, conversation_history, table_name, table_df, detected_relationships)
+        # The last round's result is returned as is, so a table that gave up is reported as failed
+        return await generate_data_for_table(semaphore, all_generated_data, conversation_history, table_name, table_df, detected_relationships_json, output_path, records_per_batch, total_records, topup_round + 1, first_slot + num_batches)
     # Return the final generated data
     print(len(all_generated_data), "Length of Generated Data")
-    return {table_name: all_generated_data}, conversation_history
-
-# Main logic to process each table one by one
+    return {table_name: all_generated_data[:total_records]}, conversation_history
+
+# Generate every table through the Batch API: one JSONL job holding all tables x batches, polled until done
+async def generate_with_batch_api(tables_to_generate, detected_relationships_json, total_records=TOTAL_RECORDS):
+    lines = []
+    for table_name, table_df in tables_to_generate.items():
+        records_per_batch = batch_size_for(table_df)
+        num_batches = -(-total_records // records_per_batch)
+        table_prompt = build_prompt(table_name, build_schema_block(table_name, table_df), detected_relationships_json, records_per_batch)
+        for batch_num in range(num_batches):
+            prompt = batch_prompt(table_prompt, batch_num)
+            lines.append(orjson.dumps({
+                "custom_id": f"{table_name}-{batch_num}",
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": {
+                    "model": AZURE_OAI_MODEL,
+                    "temperature": 0.7,
+                    "messages": [{"role": "system", "content": "You are an AI that generates structured test data."},
+                                 {"role": "user", "content": prompt}],
+                    "response_format": {"type": "json_object"},
+                },
+            }))
+
+    batch_file = await client.files.create(file=("test_data_batch.jsonl", b"\n".join(lines)), purpose="batch")
+    batch = await client.batches.create(input_file_id=batch_file.id, endpoint="/chat/completions", completion_window="24h")
+    print(f"Submitted batch {batch.id} with {len(lines)} requests")
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(BATCH_POLL_INTERVAL)
+        batch = await client.batches.retrieve(batch.id)
+        print(f"Batch {batch.id} status: {batch.status}")
+    if batch.status != "completed" or not batch.output_file_id:
+        print(f"Batch {batch.id} finished with status {batch.status}")
+        return {}
+
+    output = await client.files.content(batch.output_file_id)
+    generated = {table_name: [] for table_name in tables_to_generate}
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        result = orjson.loads(line)
+        table_name = result["custom_id"].rsplit("-", 1)[0]
+        try:
+            response_text = result["response"]["body"]["choices"][0]["message"]["content"]
+            generated[table_name].extend(orjson.loads(response_text)[table_name])
+        except (TypeError, KeyError, IndexError, orjson.JSONDecodeError) as e:
+            print(f"Unusable batch result {result['custom_id']}: {e}")
+    return {table_name: records[:total_records] for table_name, records in generated.items()}
+
+# Build the output frame column by column (much cheaper than pandas' list-of-dicts path), in the input column order.
+# Columns the model left out are empty; keys it invented are dropped.
+def records_to_frame(records, table_df):
+    columns = {col: [record.get(col) for record in records] for col in table_df.columns}
+    return pd.DataFrame(columns).convert_dtypes(dtype_backend="pyarrow")
+
+# CSV appends run on a background thread so formatting rows never delays the next requests.
+# Items are (output_path, fieldnames, records); None stops the thread.
+write_queue = queue.Queue()
+# Set when a write fails; generation stops queueing records and main re-raises it once the thread has exited
+writer_error = None
+
+def writer_loop():
+    global writer_error
+    open_files = {}
+    try:
+        while True:
+            item = write_queue.get()
+            if item is None:
+                break
+            output_path, fieldnames, records = item
+            if output_path not in open_files:
+                output_file = open(output_path, "a", newline="", encoding="utf-8")
+                # Columns the model left out are written empty; keys it invented are dropped
+                writer = csv.DictWriter(output_file, fieldnames=fieldnames, extrasaction="ignore")
+                if output_file.tell() == 0:
+                    writer.writeheader()
+                open_files[output_path] = (output_file, writer)
+            output_file, writer = open_files[output_path]
+            writer.writerows(records)
+            output_file.flush()
+    except Exception as e:
+        writer_error = e
+    finally:
+        for output_file, writer in open_files.values():
+            output_file.close()
+
+# Main logic to process each table one by one; the batches of each table run concurrently
 detected_relationships = infer_relationships(tables)
-conversation_history = [
-        {"role": "system", "content": "You are an AI that generates structured test data."},
-    ]
-
-print(tables.keys(), '===========')
-for file_name, df in tables.items():
-    if file_name not in ['2-registration.patient.csv']:
-        continue
-    print(f"Generating test data for {file_name}...")
-    all_generated_data = []
-    # Generate data for each table in batches of 10, totaling 100 records
-    generated_data, conversation_history = generate_data_for_table(all_generated_data,conversation_history, file_name, df, detected_relationships)
-
-    if generated_data:
-        generated_data = generated_data[:101] if len(generated_data)>100 else generated_data
+# The relationships are the same for every table and batch, so serialize them once
+DETECTED_RELATIONSHIPS_JSON = orjson.dumps(detected_relationships, option=orjson.OPT_INDENT_2).decode()
+
+# Generate the selected tables one by one, appending their records through the writer thread
+async def generate_tables(semaphore, conversation_history):
+    for file_name, df in tables.items():
+        if file_name not in ['2-registration.patient.csv']:
+            continue
+        if writer_error is not None:
+            break
         output_path = os.path.join(output_dir, file_name)
-        print(f"Saving generated data for {file_name} to {output_path}...")
-        generated_df = pd.DataFrame(generated_data[file_name])
-        generated_df.to_csv(output_path, index=False)
-    else:
-        print(f"Failed to generate data for {file_name}. Moving to next table.")
-
-print(f"Test data generation complete. Output saved in '{output_dir}' folder.")
\ No newline at end of file
+        # Resume from the rows an earlier (interrupted) run already wrote
+        all_generated_data = []
+        if os.path.exists(output_path):
+            with open(output_path, newline="", encoding="utf-8") as f:
+                all_generated_data = list(csv.DictReader(f))
+        if len(all_generated_data) >= TOTAL_RECORDS:
+            print(f"{output_path} already has {len(all_generated_data)} records. Skipping {file_name}.")
+            continue
+        print(f"Generating test data for {file_name} into {output_path} ({len(all_generated_data)} records already there)...")
+        # Generate data for each table in batches sized to its width, totaling TOTAL_RECORDS records
+        generated_data, conversation_history = await generate_data_for_table(semaphore, all_generated_data, conversation_history, file_name, df, DETECTED_RELATIONSHIPS_JSON, output_path)
+
+        if not generated_data:
+            print(f"Failed to generate data for {file_name}; the records generated so far are kept in {output_path}. Moving to next table.")
+
+async def main():
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    conversation_history = [
+            {"role": "system", "content": "You are an AI that generates structured test data."},
+        ]
+
+    print(tables.keys(), '===========')
+    if USE_BATCH_API:
+        tables_to_generate = {file_name: df for file_name, df in tables.items() if file_name in ['2-registration.patient.csv']}
+        generated = await generate_with_batch_api(tables_to_generate, DETECTED_RELATIONSHIPS_JSON)
+        for file_name, records in generated.items():
+            if records:
+                output_path = os.path.join(output_dir, file_name)
+                print(f"Saving generated data for {file_name} to {output_path}...")
+                records_to_frame(records, tables_to_generate[file_name]).to_csv(output_path, index=False)
+            else:
+                print(f"Failed to generate data for {file_name}. Moving to next table.")
+        return
+
+    writer_thread = threading.Thread(target=writer_loop)
+    writer_thread.start()
+    try:
+        await generate_tables(semaphore, conversation_history)
+    finally:
+        # Let the writer drain what is queued, even when generation fails
+        write_queue.put(None)
+        await asyncio.to_thread(writer_thread.join)
+    if writer_error is not None:
+        raise writer_error
+
+asyncio.run(main())
+
+print(f"Test data generation complete. Output saved in '{output_dir}' folder.")
@@ -1,17 +1,46 @@
-import os, re, json, pandas as pd, openai, random
-# Azure OpenAI Configuration
-AZURE_OAI_KEY = "EzqbdX8l2m0PzedkWSxkjESB5wGGDseac0Aq8SmfthOIqZ6jweNQJQQJ99BCACYeBjFXJ3w3AAABACOG5ZKu"
-AZURE_OAI_MODEL = "gpt-4o"
-AZURE_OPENAI_ENDPOINT = "https://qmig-open-ai.openai.azure.com/"
-AZURE_OPENAI_VERSION = "2023-08-01-preview"
-
-
-# Initialize OpenAI client
-client = openai.AzureOpenAI(
-    api_key=AZURE_OAI_KEY,
-    api_version=AZURE_OPENAI_VERSION,
-    azure_endpoint=AZURE_OPENAI_ENDPOINT,
-)
+import os, re, csv, orjson, pandas as pd, numpy as np, pyarrow as pa, pyarrow.compute as pc, pyarrow.csv as pacsv, pyarrow.parquet as pq, openai, random, asyncio, time, itertools, hashlib, httpx, tiktoken, ijson
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import lru_cache
+from collections import defaultdict
+from pathlib import Path
+# Azure OpenAI Configuration, read from the environment (the key is required, the rest have defaults)
+AZURE_OAI_KEY = os.environ["AZURE_OAI_KEY"]
+AZURE_OAI_MODEL = os.getenv("AZURE_OAI_MODEL", "gpt-4o")
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT", "https://qmig-open-ai.openai.azure.com/")
+AZURE_OPENAI_VERSION = os.getenv("AZURE_OPENAI_VERSION", "2024-08-01-preview")  # json_schema response formats need 2024-08-01-preview or later
+
+
+# Maximum number of chat completion requests in flight at once
+MAX_CONCURRENT_REQUESTS = 10
+# Number of tables packed into a single chat completion request
+TABLES_PER_REQUEST = 4
+# Number of most frequent values sent per column distribution
+DISTRIBUTION_TOP_K = 10
+# Deployment rate limits (requests / tokens per minute)
+MAX_REQUESTS_PER_MINUTE = 60
+MAX_TOKENS_PER_MINUTE = 150000
+# Hard cap on the completion length of a single request: gpt-4o's output limit, so the doubled budget
+# after a truncated response can actually grow past the first estimate
+MAX_COMPLETION_TOKENS = 16384
+SYSTEM_PROMPT = "You are an AI that generates structured test data."
+TEMPERATURE = 0.3
+
+# OpenAI client (async so that tables are generated concurrently), built once and reused for the whole run.
+# Its HTTP/2 connection pool lets concurrent requests multiplex over a few connections.
+@lru_cache(maxsize=1)
+def get_client():
+    return openai.AsyncAzureOpenAI(
+        api_key=AZURE_OAI_KEY,
+        api_version=AZURE_OPENAI_VERSION,
+        azure_endpoint=AZURE_OPENAI_ENDPOINT,
+        http_client=httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=600,
+        ),
+    )
 
 
 
@@ -381,132 +410,507 @@ client = openai.AzureOpenAI(
 
 
 
+# Leaky-bucket throttler for the deployment's RPM/TPM limits
+@dataclass
+class RateLimiter:
+    max_requests_per_minute: float
+    max_tokens_per_minute: float
+    available_request_capacity: float = 0.0
+    available_token_capacity: float = 0.0
+    last_update_time: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self):
+        self.available_request_capacity = self.max_requests_per_minute
+        self.available_token_capacity = self.max_tokens_per_minute
+
+    async def acquire(self, tokens):
+        # A single request can never need more than a full minute of capacity
+        tokens = min(tokens, self.max_tokens_per_minute)
+        while True:
+            # Refill both buckets based on the time elapsed since the last update
+            now = time.monotonic()
+            elapsed = now - self.last_update_time
+            self.available_request_capacity = min(
+                self.max_requests_per_minute,
+                self.available_request_capacity + self.max_requests_per_minute * elapsed / 60.0,
+            )
+            self.available_token_capacity = min(
+                self.max_tokens_per_minute,
+                self.available_token_capacity + self.max_tokens_per_minute * elapsed / 60.0,
+            )
+            self.last_update_time = now
+
+            if self.available_request_capacity >= 1 and self.available_token_capacity >= tokens:
+                self.available_request_capacity -= 1
+                self.available_token_capacity -= tokens
+                return
+            # Sleep until both buckets should have refilled enough instead of polling; other waiters may
+            # take the capacity first, in which case the loop simply waits again
+            request_wait = (1 - self.available_request_capacity) * 60.0 / self.max_requests_per_minute
+            token_wait = (tokens - self.available_token_capacity) * 60.0 / self.max_tokens_per_minute
+            await asyncio.sleep(max(request_wait, token_wait, 0.01))
+
+rate_limiter = RateLimiter(MAX_REQUESTS_PER_MINUTE, MAX_TOKENS_PER_MINUTE)
+# AZURE_OAI_MODEL may be a deployment name tiktoken does not know; gpt-4o's encoding is the closest default
+try:
+    encoding = tiktoken.encoding_for_model(AZURE_OAI_MODEL)
+except KeyError:
+    encoding = tiktoken.get_encoding("o200k_base")
+
+# Upper bound on the completion size; the decode stage is sequential, so fewer tokens finish sooner
+def estimate_max_tokens(pending, records_per_batch, scale=1):
+    est_max = sum(records_per_batch * (sum(len(col) for col in table_df.columns) + 100) for _, table_df in pending)
+    return min(MAX_COMPLETION_TOKENS, est_max * scale)
+
+# Estimate the tokens a request will consume: the prompt plus the completion budget
+def estimate_tokens(prompt, max_tokens):
+    return len(encoding.encode(prompt)) + max_tokens
+
+# On-disk response cache keyed by a hash of the prompt (set TESTDATA_AI_CACHE=0 to bypass)
+CACHE_DIR = ".llm_cache"
+USE_CACHE = os.getenv("TESTDATA_AI_CACHE", "1") != "0"
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+def cache_path(system_prompt, prompt, schema):
+    # The prompts embed the table names, columns, sample rows, distributions and relationships; the other
+    # request settings that change the answer are part of the key too
+    key = hashlib.blake2b(orjson.dumps({"model": AZURE_OAI_MODEL, "system": system_prompt, "temperature": TEMPERATURE,
+                                        "prompt": prompt, "schema": schema}, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+def read_cache(path):
+    if USE_CACHE and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    return None
+
+def write_cache(path, response_text):
+    if not USE_CACHE:
+        return
+    # Write to a temporary file first so concurrent readers never see a partial entry
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(response_text)
+    os.replace(tmp_path, path)
+
 # Define file paths
-files = 'C:/QProjects/TestData_AI/New_data'
-input_files = [file for file in os.listdir(files)]
+files = Path('C:/QProjects/TestData_AI/New_data')
+# Every non-empty CSV in the input folder, listed once
+input_files = [path for path in files.iterdir() if path.suffix.lower() == ".csv" and path.stat().st_size > 0]
 output_dir = "generated_test_data_new_data"
 os.makedirs(output_dir, exist_ok=True)
 
-# Read all tables into DataFrames
-tables = {file.lower(): pd.read_csv(files + '/' + file) for file in input_files}
+# Parquet copies of the input CSVs; reading them skips CSV parsing on later runs
+PARQUET_DIR = ".parquet_cache"
+os.makedirs(PARQUET_DIR, exist_ok=True)
 
-# Function to infer primary and foreign key relationships
+# Read a CSV with pyarrow into an Arrow-backed DataFrame (no BlockManager consolidation or numpy copies).
+# The parsed table is saved as Parquet and reused while it is newer than the CSV.
+def read_table(path):
+    parquet_path = Path(PARQUET_DIR) / (path.name + ".parquet")
+    if parquet_path.exists() and parquet_path.stat().st_mtime >= path.stat().st_mtime:
+        table = pq.read_table(parquet_path)
+    else:
+        table = pacsv.read_csv(path)
+        pq.write_table(table, parquet_path)
+    return table.to_pandas(types_mapper=pd.ArrowDtype)
+
+# Read all tables into DataFrames, overlapping the file reads on a thread pool
+with ThreadPoolExecutor(max_workers=min(8, len(input_files)) or 1) as executor:
+    tables = dict(zip((path.name.lower() for path in input_files), executor.map(read_table, input_files)))
+
+# Count the distinct non-null values of a column with a single np.unique pass
+def column_counts(s):
+    values = s.dropna().to_numpy()
+    if values.dtype == object:
+        values = values.astype(str)  # np.unique needs mutually comparable values
+    return np.unique(values, return_counts=True)
+
+# Top-k value distribution of a column from its value counts.
+# Only the most frequent values are kept and proportions are rounded so the prompt stays small;
+# the share of all remaining values is reported under "<other>" so the model keeps the long tail in mind.
+def top_dist(vals, counts, k=DISTRIBUTION_TOP_K):
+    if len(counts) == 0:
+        return {}
+    k = min(k, len(counts))
+    idx = np.argpartition(-counts, k - 1)[:k]
+    idx = idx[np.argsort(-counts[idx], kind="stable")]  # Most frequent values first
+    tot = counts.sum()
+    dist = {str(vals[i]): round(float(counts[i] / tot), 3) for i in idx}
+    other = 1 - counts[idx].sum() / tot
+    if other >= 0.001:
+        dist["<other>"] = round(float(other), 3)
+    return dist
+
+# Prompt summary of a column: a range for high-cardinality (key-like) columns, otherwise the top-k distribution
+def column_summary(vals, counts, n_rows):
+    if len(vals) > 0.5 * n_rows:
+        # np.unique returns sorted values, so the range comes for free
+        if vals.dtype.kind in "iuf":
+            # Numeric ranges keep their type and add the mean, so the model also sees where values cluster
+            return {"min": vals[0].item(), "max": vals[-1].item(), "mean": round(float(np.average(vals, weights=counts)), 3), "n_unique": int(len(vals))}
+        return {"min": str(vals[0]), "max": str(vals[-1]), "n_unique": int(len(vals))}
+    return top_dist(vals, counts)
+
+# (min, max) of an Arrow array, or None when it is empty or its type has no ordering
+def value_range(arr):
+    try:
+        bounds = pc.min_max(arr)
+    except pa.ArrowNotImplementedError:
+        return None
+    if not bounds["min"].is_valid:
+        return None
+    return bounds["min"].as_py(), bounds["max"].as_py()
+
+# Function to infer primary and foreign key relationships together with the column distributions,
+# walking every column once; also returns the primary key values by (table, column)
 def infer_relationships(tables):
     relationships = []
     primary_keys = {}
-
-    # Identify primary keys (columns with unique values)
-    for table_name, df in tables.items():
-        for col in df.columns:
-            if df[col].nunique() == len(df):  # Column has unique values
-                primary_keys[(table_name, col)] = df[col].tolist()
-
-    # Identify foreign keys (columns matching primary keys in other tables)
-    for table_name, df in tables.items():
-        for col in df.columns:
-            for (pk_table, pk_col), pk_values in primary_keys.items():
-                if col != pk_col and df[col].isin(pk_values).sum() > len(df) * 0.8:  # 80% match
-                    relationships.append({
-                        "table": table_name,
-                        "column": col,
-                        "references": pk_table,
-                        "referenced_column": pk_col
-                    })
-
-    return relationships
-
-# Function to generate data for a single table in batches, using all previous data
-def generate_data_for_table(all_generated_data, previous_generated_data, table_name, table_df, detected_relationships, records_per_batch=5, total_records=20):
-    
-    # Number of batches we need
-    num_batches = total_records // records_per_batch
-    print('num_batches:', num_batches)
-    for batch_num in range(num_batches):
-        print('batch_num:', batch_num)
-        # Convert all previous generated data into a format that can be passed in the prompt
-        previous_data = json.dumps(previous_generated_data[-5:])  # We limit the previous data context to 5 records
-        # previous_data = json.dumps(previous_generated_data)  # We limit the previous data context to 5 records
-
-        prompt = f"""
-        I have a related SQL table '{table_name}' stored in an Excel file. The table has the following structure and inferred relationships.
+    column_distributions = {}
+    # Each column as an Arrow array, converted once and shared by both passes
+    arrays = {(table_name, col): pa.array(df[col]) for table_name, df in tables.items() for col in df.columns}
+
+    # Count each column once: the counts give both the prompt distribution and the primary key check.
+    # Columns are counted on a thread pool, since numpy's sort behind np.unique releases the GIL for numeric data
+    with ThreadPoolExecutor(max_workers=min(8, len(arrays)) or 1) as executor:
+        column_results = executor.map(lambda key: column_counts(tables[key[0]][key[1]]), arrays)
+        column_distributions = {table_name: {} for table_name in tables}
+        for (table_name, col), (vals, counts) in zip(arrays, column_results):
+            n_rows = len(tables[table_name])
+            column_distributions[table_name][col] = column_summary(vals, counts, n_rows)
+            if len(vals) == n_rows:  # Column has unique, non-null values
+                primary_keys[(table_name, col)] = pc.unique(arrays[(table_name, col)])
+
+    # Identify foreign keys (columns matching primary keys in other tables).
+    # Primary keys are grouped by Arrow type, so each column is only paired with keys it could match; the
+    # pairs are tested on a thread pool, since Arrow's compute kernels release the GIL and the tests are
+    # independent of each other.
+    pks_by_type = defaultdict(list)
+    for (pk_table, pk_col), pk_arr in primary_keys.items():
+        pks_by_type[pk_arr.type].append((pk_table, pk_col))
+    pairs = [(table_name, col, pk_table, pk_col)
+             for table_name, df in tables.items() for col in df.columns
+             for pk_table, pk_col in pks_by_type.get(arrays[(table_name, col)].type, [])
+             if col != pk_col]
+
+    # Cheap prescreen: a column cannot have 80% of its values in a key whose value range it does not even
+    # overlap, so those pairs skip the full membership scan
+    ranges = {key: value_range(arrays[key]) for pair in pairs for key in (pair[:2], pair[2:])}
+
+    def ranges_overlap(pair):
+        table_name, col, pk_table, pk_col = pair
+        col_range, pk_range = ranges[(table_name, col)], ranges[(pk_table, pk_col)]
+        if col_range is None or pk_range is None:
+            return True
+        return col_range[1] >= pk_range[0] and col_range[0] <= pk_range[1]
+
+    pairs = [pair for pair in pairs if ranges_overlap(pair)]
+
+    def is_foreign_key(pair):
+        table_name, col, pk_table, pk_col = pair
+        # Hashed membership test in Arrow's C++ kernel, no Python objects involved
+        hits = pc.sum(pc.is_in(arrays[(table_name, col)], value_set=primary_keys[(pk_table, pk_col)])).as_py() or 0
+        return hits > len(tables[table_name]) * 0.8  # 80% match
+
+    with ThreadPoolExecutor(max_workers=min(8, len(pairs)) or 1) as executor:
+        for (table_name, col, pk_table, pk_col), matched in zip(pairs, executor.map(is_foreign_key, pairs)):
+            if matched:
+                relationships.append({
+                    "table": table_name,
+                    "column": col,
+                    "references": pk_table,
+                    "referenced_column": pk_col
+                })
+
+    return relationships, column_distributions, primary_keys
+
+# First rows of a table as records, built from one ndarray instead of DataFrame.to_dict
+def sample_records(df, n=5):
+    columns = list(df.columns)
+    return [dict(zip(columns, row)) for row in df.head(n).to_numpy().tolist()]
+
+# JSON schema type of a column, from its Arrow type; dates and timestamps are requested as strings.
+# null is always allowed because input columns can have blanks.
+def column_json_type(dtype):
+    arrow_type = dtype.pyarrow_dtype
+    if pa.types.is_boolean(arrow_type):
+        return {"type": ["boolean", "null"]}
+    if pa.types.is_integer(arrow_type):
+        return {"type": ["integer", "null"]}
+    if pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+        return {"type": ["number", "null"]}
+    return {"type": ["string", "null"]}
+
+# Strict JSON schema for the response: one array of records per table, with exactly the table's columns
+def response_schema(pending):
+    properties = {}
+    for table_name, table_df in pending:
+        properties[table_name] = {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {col: column_json_type(table_df[col].dtype) for col in table_df.columns},
+                "required": list(table_df.columns),
+                "additionalProperties": False,
+            },
+        }
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+# Send one streamed chat completion, retrying transient API errors with exponential backoff.
+# Each table's records are parsed incrementally while the tokens arrive, so decoding overlaps the network and
+# a malformed response raises ijson.JSONError as soon as it goes wrong; returns (response_text, {table: records}).
+async def request_completion(semaphore, system_prompt, prompt, max_tokens, schema, table_names, max_attempts=5):
+    for attempt in range(max_attempts):
+        try:
+            async with semaphore:
+                await rate_limiter.acquire(estimate_tokens(system_prompt + prompt, max_tokens))
+                stream = await get_client().chat.completions.create(
+                    model=AZURE_OAI_MODEL,
+                    messages=[{"role": "system", "content": system_prompt},
+                              {"role": "user", "content": prompt}],
+                    temperature=TEMPERATURE,
+                    max_tokens=max_tokens,
+                    response_format={"type": "json_schema", "json_schema": {"name": "generated_test_data", "schema": schema, "strict": True}},
+                    timeout=600,
+                    stream=True
+                )
+                # Accumulate the streamed deltas (for the cache) and feed them to one parser per table
+                buffer = bytearray()
+                records = {table_name: ijson.sendable_list() for table_name in table_names}
+                parsers = [ijson.items_coro(records[table_name], f"{table_name}.item", use_float=True) for table_name in table_names]
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        data = delta.encode()
+                        buffer.extend(data)
+                        for parser in parsers:
+                            parser.send(data)
+                for parser in parsers:
+                    parser.close()  # Raises ijson.IncompleteJSONError if the response was cut off
+            return buffer.decode(), {table_name: list(table_records) for table_name, table_records in records.items()}
+        # Only transient failures are retried; bad requests, auth and not-found errors propagate immediately
+        except (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError) as e:
+            if attempt == max_attempts - 1:
+                raise
+            delay = min(60, 2 ** attempt) + random.random()
+            print(f"API error ({e.__class__.__name__}), retrying in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+
+# A different random handful of input rows per batch; it varies the prompts so that concurrent batches,
+# which cannot see each other's output, do not all produce the same records
+def seed_records(df, seed, n=5):
+    columns = list(df.columns)
+    return [dict(zip(columns, row)) for row in df.sample(n=min(n, len(df)), random_state=seed).to_numpy().tolist()]
+
+# True if none of the record's primary key values has been seen yet; the values are then marked as seen.
+# Missing values are not keys, so they never reject a record and are never marked.
+def has_new_keys(seen_keys, record):
+    if any(record.get(col) is not None and record.get(col) in seen for col, seen in seen_keys.items()):
+        return False
+    for col, seen in seen_keys.items():
+        if record.get(col) is not None:
+            seen.add(record.get(col))
+    return True
+
+# Function to generate data for a group of tables in batches, one request per batch for the whole group.
+# The batches of a round are independent of each other and run concurrently; tables still short of
+# total_records afterwards get up to max_rounds - 1 top-up rounds. Every merged batch is appended to the
+# table's "<output>.part" CSV straight away; the file is renamed to the final name when the group finishes.
+# Returns the number of records written per table, or None when a request failed outright.
+async def generate_data_for_tables(semaphore, generated_counts, batch, rel_json, records_per_batch=5, total_records=20, max_rounds=3):
+
+    # Everything that is the same for every request of this group goes into the system message, built once, so
+    # Azure's prompt cache can reuse it; the user message only carries what changes per batch
+    schema_blocks = "".join(f"""
+        {{ "file_name": "{table_name}", "schema": {SCHEMA_JSON[table_name]} }}""" for table_name, _ in batch)
+    system_prompt = f"""{SYSTEM_PROMPT}
+        I have related SQL tables stored in Excel files. The tables have the following structure and inferred relationships.
 
         Detected Relationships:
-        {json.dumps(detected_relationships, indent=2)}
+        {rel_json}
 
         Table Structure & Data Patterns:
-        {{ "file_name": "{table_name}", "schema": {{
-            "columns": {json.dumps(list(table_df.columns))},
-            "sample_data": {json.dumps(table_df.head(5).to_dict(orient="records"))},
-            "column_distributions": {json.dumps({col: table_df[col].value_counts(normalize=True).to_dict() for col in table_df.columns})}
-        }} }}
-
-        **Task:** Generate {records_per_batch} unique test records for the table while preserving the same format as the input file.
-        - Keep the same column names and data types.
+        {schema_blocks}
+
+        Rules for every request:
+        - Preserve the same format as the input files: keep the same column names and data types.
         - Maintain primary key uniqueness and foreign key relationships.
         - Distribute values similarly to the original dataset but ensure that the generated values do not match any existing values in the input files.
-        - Ensure the generated data is different from all previously generated data: {previous_data}
-        - Return the output as a complete and valid JSON object with this structure: {{ {table_name}: [{{column1: value, column2: value, ...}}] }}. Ensure the response is properly closed and contains all necessary brackets and commas.
+        - Return one key per file_name holding the list of generated records.
         """
-        
-        # Send the prompt to OpenAI API
-        try:
-            response = client.chat.completions.create(
-                model=AZURE_OAI_MODEL,
-                messages=[{"role": "system", "content": "You are an AI that generates structured test data."},
-                          {"role": "user", "content": prompt}],
-                temperature=0.7,
-                response_format={"type": "json_object"},
-                timeout=600
-            )
 
-            response_text = response.choices[0].message.content
-            # Parse the response
-            try:
-                generated_data = json.loads(response_text)
-                new_records = generated_data[table_name]  # Extract the batch of records
-                print(len(new_records), ' Length of Batch Records')
-                # Add the new batch of records to all generated data
-                all_generated_data.extend(new_records)
-                previous_generated_data.extend(new_records)  # Add to the previous batch data for next iteration
-
-                # Ensure we only generate the desired number of records
-                if len(all_generated_data) >= total_records:
-                    break
+    async def run_batch(pending, schema, round_num, batch_num, completion_scale, json_reminder):
+        print('batch_num:', batch_num)
+        seed = round_num * 1000 + batch_num
+        seed_blocks = "".join(f"""
+        {{ "file_name": "{table_name}", "seed_rows": {orjson.dumps(seed_records(table_df, seed), default=str).decode()} }}""" for table_name, table_df in pending)
 
-            except json.JSONDecodeError as e:
-                print(f"JSON decode error for {table_name}: {e}")
-                continue
+        prompt = f"""
+        **Task:** Generate {records_per_batch} unique test records for each of these tables: {", ".join(table_name for table_name, _ in pending)}.
+        Use the seed rows below as a starting point for variety; the generated records must differ from them.
+        {seed_blocks}{json_reminder}
+        """
 
-        except Exception as e:
-            print(f"Error generating data for {table_name} (batch {batch_num+1}): {e}")
+        # Send the prompt to OpenAI API, unless an identical prompt has already been answered
+        response_path = cache_path(system_prompt, prompt, schema)
+        response_text = read_cache(response_path)
+        # Parse the response
+        try:
+            if response_text is not None:
+                return orjson.loads(response_text)
+            max_tokens = estimate_max_tokens(pending, records_per_batch, completion_scale)
+            response_text, generated_data = await request_completion(semaphore, system_prompt, prompt, max_tokens, schema, [table_name for table_name, _ in pending])
+        except (orjson.JSONDecodeError, ijson.JSONError) as e:
+            print(f"JSON decode error for {[table_name for table_name, _ in pending]}: {e}")
             return None
-    if len(all_generated_data) < total_records:
-        print('Attempted to generate less records than requested')
-        generated_data = generate_data_for_table(all_generated_data, previous_generated_data,table_name, table_df, detected_relationships)
-    # Return the final generated data
-    return {table_name: all_generated_data}
-
-# Main logic to process each table one by one
-detected_relationships = infer_relationships(tables)
+        write_cache(response_path, response_text)
+        return generated_data
+
+    completion_scale = 1  # Raised when a truncated response fails to parse
+    json_reminder = ""  # Added to the next round's prompts after a malformed response
+    # Primary key values already taken, starting with the input data; records reusing one are dropped
+    seen_keys = {table_name: {col: set(primary_keys[(table_name, col)].to_pylist()) for col in PRIMARY_KEY_COLUMNS[table_name]}
+                 for table_name, _ in batch}
+    part_paths = {table_name: os.path.join(output_dir, table_name) + ".part" for table_name, _ in batch}
+    try:
+        with ExitStack() as stack:
+            writers = {}
+            for table_name, table_df in batch:
+                output_file = stack.enter_context(open(part_paths[table_name], "w", newline="", encoding="utf-8"))
+                # Columns the model left out are written empty; keys it invented are dropped
+                writer = csv.DictWriter(output_file, fieldnames=list(table_df.columns), extrasaction="ignore")
+                writer.writeheader()
+                writers[table_name] = (output_file, writer)
+            for round_num in range(max_rounds):
+                # Only ask for the tables that still need records
+                pending = [(table_name, table_df) for table_name, table_df in batch if generated_counts[table_name] < total_records]
+                if not pending:
+                    break
+                if round_num:
+                    print('Attempted to generate less records than requested')
+                # Number of batches we need for the table missing the most records
+                num_batches = -(-max(total_records - generated_counts[table_name] for table_name, _ in pending) // records_per_batch)
+                print('num_batches:', num_batches)
+                schema = response_schema(pending)
+
+                results = await asyncio.gather(*[run_batch(pending, schema, round_num, batch_num, completion_scale, json_reminder) for batch_num in range(num_batches)], return_exceptions=True)
+
+                # Merge the batches in order
+                parse_failed = False
+                for batch_num, generated_data in enumerate(results):
+                    if isinstance(generated_data, Exception):
+                        print(f"Error generating data for {[table_name for table_name, _ in pending]} (batch {batch_num+1}): {generated_data}")
+                        return None
+                    if generated_data is None:
+                        parse_failed = True
+                        continue
+                    for table_name, _ in pending:
+                        new_records = generated_data.get(table_name, [])  # Extract the batch of records for this table
+                        print(table_name, len(new_records), ' Length of Batch Records')
+                        new_records = [record for record in new_records if has_new_keys(seen_keys[table_name], record)]
+                        # Write the new batch of records without overshooting the requested total; only the count stays in memory
+                        new_records = new_records[:total_records - generated_counts[table_name]]
+                        generated_counts[table_name] += len(new_records)
+                        output_file, writer = writers[table_name]
+                        writer.writerows(new_records)
+                        output_file.flush()
+
+                if parse_failed:
+                    completion_scale *= 2  # The response may have been cut off by max_tokens
+                    json_reminder = "\n        - Your previous response was not valid JSON. Close every bracket and brace and return only the JSON object."
+
+        # Publish the finished files; a table that got nothing leaves no output so the next run retries it
+        for table_name, _ in batch:
+            if generated_counts[table_name]:
+                print(f"Saving generated data for {table_name} to {os.path.join(output_dir, table_name)}...")
+                os.replace(part_paths[table_name], os.path.join(output_dir, table_name))
+            else:
+                os.remove(part_paths[table_name])
+        return {table_name: generated_counts[table_name] for table_name, _ in batch}
+    finally:
+        # A group that failed or was cancelled leaves no partial files behind, so the next run retries it
+        for part_path in part_paths.values():
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+# Main logic to process all tables concurrently
+detected_relationships, column_distributions, primary_keys = infer_relationships(tables)
+# Columns whose values must stay unique in the generated data, per table: the ones other tables reference,
+# or else the first id-like unique column. With only a handful of input rows many other columns look unique
+# by chance, and deduplicating on them would drop valid records.
+PRIMARY_KEY_COLUMNS = defaultdict(list)
+for rel in detected_relationships:
+    if rel["referenced_column"] not in PRIMARY_KEY_COLUMNS[rel["references"]]:
+        PRIMARY_KEY_COLUMNS[rel["references"]].append(rel["referenced_column"])
+for pk_table, pk_col in primary_keys:
+    if not PRIMARY_KEY_COLUMNS[pk_table] and "id" in str(pk_col).lower():
+        PRIMARY_KEY_COLUMNS[pk_table].append(pk_col)
+# Relationships indexed by both tables they connect, so each group's prompt only carries the ones that
+# touch its tables
+RELATIONSHIPS_BY_TABLE = defaultdict(list)
+for rel in detected_relationships:
+    RELATIONSHIPS_BY_TABLE[rel["table"]].append(rel)
+    if rel["references"] != rel["table"]:
+        RELATIONSHIPS_BY_TABLE[rel["references"]].append(rel)
+
+# Compact JSON of the relationships involving any of the given tables, each listed once
+def relationships_json(table_names):
+    rels = []
+    for table_name in table_names:
+        for rel in RELATIONSHIPS_BY_TABLE[table_name]:
+            if rel not in rels:
+                rels.append(rel)
+    return orjson.dumps(rels).decode()
+
+# Serialize each table's schema block (columns, sample rows, distributions) once; only the seed rows change
+# between batches
+SCHEMA_JSON = {
+    file_name: orjson.dumps({
+        "columns": list(df.columns),
+        "sample_data": sample_records(df),
+        "column_distributions": column_distributions[file_name],
+    }, default=str).decode()
+    for file_name, df in tables.items()
+}
 
 print(tables.keys(), '===========')
-for file_name, df in tables.items():
-    # if file_name not in ['1-registration.registrationmaster.csv']:
-    #     continue
-    print(f"Generating test data for {file_name}...")
-    all_generated_data = []  # List to store all generated data
-    previous_generated_data = []  # Keep track of all previous batches' records
-    # Generate data for each table in batches of 10, totaling 100 records
-    generated_data = generate_data_for_table(all_generated_data, previous_generated_data,file_name, df, detected_relationships)
-
-    if generated_data:
-        generated_data = generated_data[:101] if len(generated_data)>100 else generated_data
-        output_path = os.path.join(output_dir, file_name)
-        print(f"Saving generated data for {file_name} to {output_path}...")
-        generated_df = pd.DataFrame(generated_data[file_name])
-        generated_df.to_csv(output_path, index=False)
-    else:
-        print(f"Failed to generate data for {file_name}. Moving to next table.")
+
+async def main():
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    tasks = []
+    # Pack several tables into each request to cut the request count and repeated prompt tokens.
+    # Tables are grouped by column count so the requests are similar in size and none waits on one huge table.
+    # Tables whose output already exists were generated by an earlier run and are skipped; they are still
+    # loaded because relationship inference needs every table.
+    # An empty output file counts as not generated.
+    to_generate = {file_name: df for file_name, df in tables.items()
+                   if not ((output_path := Path(output_dir) / file_name).exists() and output_path.stat().st_size > 0)}
+    for file_name in tables.keys() - to_generate.keys():
+        print(f"Output for {file_name} already exists. Skipping.")
+    items = iter(sorted(to_generate.items(), key=lambda item: len(item[1].columns)))
+    while batch := list(itertools.islice(items, TABLES_PER_REQUEST)):
+        print(f"Generating test data for {[file_name for file_name, _ in batch]}...")
+        generated_counts = {file_name: 0 for file_name, _ in batch}  # Records written so far per table
+        rel_json = relationships_json([file_name for file_name, _ in batch])
+        print(f"Relationships: {len(encoding.encode(rel_json))} prompt tokens for this group")
+        # Generate data for each table in batches of 5, totaling 20 records
+        tasks.append(generate_data_for_tables(semaphore, generated_counts, batch, rel_json))
+
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    # The CSVs were written while generating; report the tables that got nothing
+    generated = {}
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Error generating data: {result}")
+        elif result:
+            generated.update(result)
+    for file_name in to_generate:
+        if not generated.get(file_name):
+            print(f"Failed to generate data for {file_name}. Moving to next table.")
+
+asyncio.run(main())
 
 print(f"Test data generation complete. Output saved in '{output_dir}' folder.")
 
@@ -13,27 +13,123 @@ Augment VSCode 扩展本地存储完整清理工具
 """
 
 import os
+import re
 import sys
 import json
 import shutil
 import sqlite3
 import logging
+import logging.handlers
+import subprocess
 import argparse
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Callable
+
+# 可选依赖：orjson（更快的 JSON 解析/序列化）、ijson（流式解析）
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 # 配置日志
+# 日志文件的写入先缓存在内存中，遇到错误或程序退出时（logging 在退出时会自动 flush）再批量写入
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+_log_file_handler = logging.FileHandler('augment_cleaner.log', encoding='utf-8')
+_log_file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
+    format=LOG_FORMAT,
     handlers=[
-        logging.FileHandler('augment_cleaner.log', encoding='utf-8'),
+        logging.handlers.MemoryHandler(capacity=1000, flushLevel=logging.ERROR, target=_log_file_handler),
         logging.StreamHandler(sys.stdout)
     ]
 )
 logger = logging.getLogger(__name__)
 
+def _scandir_recursive(root):
+    """递归遍历目录，产出 os.DirEntry（类型判断使用缓存的 d_type，避免重复 stat）"""
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return  # 目录不存在或已被删除
+    with it:
+        for entry in it:
+            yield entry
+            if entry.is_dir(follow_symlinks=False):
+                yield from _scandir_recursive(entry.path)
+
+def _fast_rmtree(path) -> None:
+    """删除目录树，优先使用系统命令（rd /s /q 或 rm -rf），失败时回退到 shutil.rmtree"""
+    if sys.platform == "win32":
+        command = ["cmd", "/c", "rd", "/s", "/q", str(path)]
+    else:
+        command = ["rm", "-rf", str(path)]
+    try:
+        result = subprocess.run(command, check=False, capture_output=True)
+        if result.returncode == 0 and not os.path.exists(path):
+            return
+    except OSError:
+        pass  # 系统命令不可用
+    shutil.rmtree(path)  # 保留异常，由调用方记录清理失败
+
+def _copytree_linked(src, dst) -> None:
+    """以硬链接方式复制目录树（只创建链接，不复制数据），不支持硬链接时回退到普通复制
+
+    备份的源目录随后会被整体删除，删除只会移除一个链接，备份中的文件内容不受影响。
+    """
+    try:
+        shutil.copytree(src, dst, copy_function=os.link)
+    except OSError:
+        # 跨设备（EXDEV）或文件系统不支持硬链接
+        shutil.rmtree(dst, ignore_errors=True)
+        shutil.copytree(src, dst)
+
+def _backup_tree(src, dst, strategy: str = 'link') -> None:
+    """按指定策略备份目录树
+
+    - link: 硬链接快照（默认）
+    - copy: 完整复制
+    - move: 直接把目录移动到备份位置（同一文件系统上只需一次 rename），
+      源目录随之消失，后续清理该目录的步骤将直接跳过；Augment 扩展会在 VSCode 下次启动时重建目录
+    """
+    if strategy == 'move':
+        try:
+            os.replace(src, dst)
+            return
+        except OSError:
+            pass  # 跨文件系统无法移动，回退到复制
+        shutil.copytree(src, dst)
+    elif strategy == 'copy':
+        shutil.copytree(src, dst)
+    else:
+        _copytree_linked(src, dst)
+
+# 扫描结果中每个分类保留（并显示）的条目数
+SCAN_PREVIEW_LIMIT = 10
+
+class ScanCategory:
+    """扫描结果的一个分类：只保留前 SCAN_PREVIEW_LIMIT 项，其余只计数"""
+
+    def __init__(self):
+        self.items: List[str] = []
+        self.total = 0
+
+    def add(self, item: str):
+        if len(self.items) < SCAN_PREVIEW_LIMIT:
+            self.items.append(item)
+        self.total += 1
+
+# 清理时的发现回调：on_found(分类, 条目)，分类与 scan_augment_data 的结果键一致
+FoundCallback = Optional[Callable[[str, str], None]]
+
 class AugmentCleaner:
     """Augment 扩展存储清理器"""
     
@@ -42,17 +138,6 @@ class AugmentCleaner:
         self.backup_dir = Path("augment_backup") / datetime.now().strftime("%Y%m%d_%H%M%S")
         self.extension_id = "Augment.vscode-augment"
         
-        # 存储路径定义
-        self.storage_paths = {
-            'global_storage': self.vscode_data_dir / "User" / "globalStorage" / self.extension_id,
-            'workspace_storage_root': self.vscode_data_dir / "User" / "workspaceStorage",
-            'user_settings': self.vscode_data_dir / "User" / "settings.json",
-            'user_keybindings': self.vscode_data_dir / "User" / "keybindings.json",
-            'extensions_dir': self.vscode_data_dir / "extensions",
-            'logs_dir': self.vscode_data_dir / "logs",
-            'cache_dir': self.vscode_data_dir / "CachedExtensions"
-        }
-        
         # Augment 相关的存储键值
         self.augment_keys = [
             "sidecar.Augment.vscode-augment",
@@ -75,7 +160,44 @@ class AugmentCleaner:
             "augment.advanced.completionURL",
             "augment.advanced.integrations"
         ]
+
+        # 预编译配置键匹配：所有配置键都以 "augment." 开头，先用前缀快速排除无关键
+        self._augment_prefix = "augment."
+        self._augment_key_re = re.compile("|".join(re.escape(k) for k in self.augment_config_keys))
+
+    def _is_augment_config_key(self, key: str) -> bool:
+        """判断配置键是否为 Augment 相关配置"""
+        return key.startswith(self._augment_prefix) and self._augment_key_re.search(key) is not None
     
+    # 存储路径定义（按需计算并缓存，只运行单项操作时不必构建全部路径）
+    @cached_property
+    def global_storage(self) -> Path:
+        return self.vscode_data_dir / "User" / "globalStorage" / self.extension_id
+
+    @cached_property
+    def workspace_storage_root(self) -> Path:
+        return self.vscode_data_dir / "User" / "workspaceStorage"
+
+    @cached_property
+    def user_settings(self) -> Path:
+        return self.vscode_data_dir / "User" / "settings.json"
+
+    @cached_property
+    def user_keybindings(self) -> Path:
+        return self.vscode_data_dir / "User" / "keybindings.json"
+
+    @cached_property
+    def extensions_dir(self) -> Path:
+        return self.vscode_data_dir / "extensions"
+
+    @cached_property
+    def logs_dir(self) -> Path:
+        return self.vscode_data_dir / "logs"
+
+    @cached_property
+    def cache_dir(self) -> Path:
+        return self.vscode_data_dir / "CachedExtensions"
+
     def _get_vscode_data_dir(self) -> Path:
         """获取 VSCode 数据目录"""
         if sys.platform == "win32":
@@ -85,36 +207,53 @@ class AugmentCleaner:
         else:  # Linux
             return Path.home() / ".config" / "Code"
     
-    def create_backup(self) -> bool:
-        """创建备份"""
+    def _augment_workspace_dirs(self, workspace_root: Path):
+        """遍历工作区存储，产出 (工作区目录名, Augment 数据目录路径)
+
+        使用 os.scandir 的缓存类型跳过非目录项，每个工作区只需一次 stat 判断 Augment 目录是否存在。
+        """
+        with os.scandir(workspace_root) as it:
+            for workspace_dir in it:
+                if not workspace_dir.is_dir(follow_symlinks=False):
+                    continue
+                augment_workspace = os.path.join(workspace_dir.path, self.extension_id)
+                if os.path.isdir(augment_workspace):
+                    yield workspace_dir.name, augment_workspace
+
+    def create_backup(self, strategy: str = 'link') -> bool:
+        """创建备份（strategy: 'link' | 'copy' | 'move'，见 _backup_tree）"""
         try:
             logger.info(f"创建备份到: {self.backup_dir}")
             self.backup_dir.mkdir(parents=True, exist_ok=True)
             
             # 备份全局存储
-            global_storage = self.storage_paths['global_storage']
+            global_storage = self.global_storage
             if global_storage.exists():
                 backup_global = self.backup_dir / "globalStorage"
-                shutil.copytree(global_storage, backup_global)
+                _backup_tree(global_storage, backup_global, strategy)
                 logger.info(f"已备份全局存储: {backup_global}")
             
             # 备份工作区存储中的 Augment 数据
-            workspace_root = self.storage_paths['workspace_storage_root']
+            workspace_root = self.workspace_storage_root
             if workspace_root.exists():
                 backup_workspace = self.backup_dir / "workspaceStorage"
                 backup_workspace.mkdir(exist_ok=True)
                 
-                for workspace_dir in workspace_root.iterdir():
-                    if workspace_dir.is_dir():
-                        augment_workspace = workspace_dir / self.extension_id
-                        if augment_workspace.exists():
-                            backup_path = backup_workspace / workspace_dir.name / self.extension_id
-                            backup_path.parent.mkdir(parents=True, exist_ok=True)
-                            shutil.copytree(augment_workspace, backup_path)
-                            logger.info(f"已备份工作区存储: {backup_path}")
+                # 各工作区相互独立，在线程池中并行备份
+                backup_jobs = []
+                for workspace_name, augment_workspace in self._augment_workspace_dirs(workspace_root):
+                    backup_path = backup_workspace / workspace_name / self.extension_id
+                    backup_path.parent.mkdir(parents=True, exist_ok=True)
+                    backup_jobs.append((augment_workspace, backup_path))
+
+                if backup_jobs:
+                    with ThreadPoolExecutor(max_workers=min(8, len(backup_jobs))) as executor:
+                        list(executor.map(lambda job: _backup_tree(job[0], job[1], strategy), backup_jobs))
+                    for _, backup_path in backup_jobs:
+                        logger.info(f"已备份工作区存储: {backup_path}")
             
             # 备份用户配置
-            settings_file = self.storage_paths['user_settings']
+            settings_file = self.user_settings
             if settings_file.exists():
                 backup_settings = self.backup_dir / "settings.json"
                 shutil.copy2(settings_file, backup_settings)
@@ -126,13 +265,15 @@ class AugmentCleaner:
             logger.error(f"备份失败: {e}")
             return False
     
-    def clean_global_storage(self) -> bool:
+    def clean_global_storage(self, on_found: FoundCallback = None) -> bool:
         """清理全局存储"""
         try:
-            global_storage = self.storage_paths['global_storage']
+            global_storage = self.global_storage
             if global_storage.exists():
                 logger.info(f"清理全局存储: {global_storage}")
-                shutil.rmtree(global_storage)
+                if on_found:
+                    on_found('global_storage', str(global_storage))
+                _fast_rmtree(global_storage)
                 logger.info("全局存储清理完成")
                 return True
             else:
@@ -143,22 +284,24 @@ class AugmentCleaner:
             logger.error(f"清理全局存储失败: {e}")
             return False
     
-    def clean_workspace_storage(self) -> bool:
+    def clean_workspace_storage(self, on_found: FoundCallback = None) -> bool:
         """清理工作区存储"""
         try:
-            workspace_root = self.storage_paths['workspace_storage_root']
+            workspace_root = self.workspace_storage_root
             if not workspace_root.exists():
                 logger.info("工作区存储目录不存在，跳过清理")
                 return True
             
-            cleaned_count = 0
-            for workspace_dir in workspace_root.iterdir():
-                if workspace_dir.is_dir():
-                    augment_workspace = workspace_dir / self.extension_id
-                    if augment_workspace.exists():
-                        logger.info(f"清理工作区存储: {augment_workspace}")
-                        shutil.rmtree(augment_workspace)
-                        cleaned_count += 1
+            # 各工作区相互独立，在线程池中并行删除
+            targets = [augment_workspace for _, augment_workspace in self._augment_workspace_dirs(workspace_root)]
+            if targets:
+                for augment_workspace in targets:
+                    logger.info(f"清理工作区存储: {augment_workspace}")
+                    if on_found:
+                        on_found('workspace_storage', augment_workspace)
+                with ThreadPoolExecutor(max_workers=min(8, len(targets))) as executor:
+                    list(executor.map(_fast_rmtree, targets))
+            cleaned_count = len(targets)
             
             logger.info(f"工作区存储清理完成，共清理 {cleaned_count} 个工作区")
             return True
@@ -167,29 +310,39 @@ class AugmentCleaner:
             logger.error(f"清理工作区存储失败: {e}")
             return False
     
-    def clean_user_settings(self) -> bool:
+    def clean_user_settings(self, on_found: FoundCallback = None) -> bool:
         """清理用户配置中的 Augment 相关设置"""
         try:
-            settings_file = self.storage_paths['user_settings']
+            settings_file = self.user_settings
             if not settings_file.exists():
                 logger.info("用户配置文件不存在，跳过清理")
                 return True
             
             # 读取配置文件
-            with open(settings_file, 'r', encoding='utf-8') as f:
-                settings = json.load(f)
+            if orjson is not None:
+                with open(settings_file, 'rb') as f:
+                    settings = orjson.loads(f.read())
+            else:
+                with open(settings_file, 'r', encoding='utf-8') as f:
+                    settings = json.load(f)
             
-            # 移除 Augment 相关配置
-            removed_keys = []
-            for key in list(settings.keys()):
-                if any(augment_key in key for augment_key in self.augment_config_keys):
-                    del settings[key]
-                    removed_keys.append(key)
+            # 移除 Augment 相关配置（一次遍历重建字典，而不是逐个 del）
+            removed_keys = [key for key in settings if self._is_augment_config_key(key)]
             
             if removed_keys:
+                if on_found:
+                    for key in removed_keys:
+                        on_found('user_settings', f"{key}: {settings[key]}")
+                removed_set = set(removed_keys)
+                settings = {k: v for k, v in settings.items() if k not in removed_set}
+
                 # 写回配置文件
-                with open(settings_file, 'w', encoding='utf-8') as f:
-                    json.dump(settings, f, indent=2, ensure_ascii=False)
+                if orjson is not None:
+                    with open(settings_file, 'wb') as f:
+                        f.write(orjson.dumps(settings, option=orjson.OPT_INDENT_2))
+                else:
+                    with open(settings_file, 'w', encoding='utf-8') as f:
+                        json.dump(settings, f, indent=2, ensure_ascii=False)
                 
                 logger.info(f"用户配置清理完成，移除了 {len(removed_keys)} 个配置项: {removed_keys}")
             else:
@@ -201,49 +354,68 @@ class AugmentCleaner:
             logger.error(f"清理用户配置失败: {e}")
             return False
     
-    def clean_extension_logs(self) -> bool:
+    def clean_extension_logs(self, on_found: FoundCallback = None) -> bool:
         """清理扩展日志"""
         try:
-            logs_dir = self.storage_paths['logs_dir']
+            logs_dir = self.logs_dir
             if not logs_dir.exists():
                 logger.info("日志目录不存在，跳过清理")
                 return True
             
             cleaned_count = 0
-            for log_file in logs_dir.rglob("*augment*"):
-                if log_file.is_file():
-                    logger.info(f"清理日志文件: {log_file}")
-                    log_file.unlink()
-                    cleaned_count += 1
+            failed_count = 0
+            for entry in _scandir_recursive(logs_dir):
+                if "augment" in entry.name.lower() and entry.is_file():
+                    logger.debug(f"清理日志文件: {entry.path}")
+                    # 单个文件删除失败不中断整批清理
+                    try:
+                        os.unlink(entry.path)
+                        cleaned_count += 1
+                        if on_found:
+                            on_found('logs', entry.path)
+                    except OSError as e:
+                        logger.warning(f"删除日志文件失败: {entry.path}: {e}")
+                        failed_count += 1
             
             logger.info(f"扩展日志清理完成，共清理 {cleaned_count} 个日志文件")
-            return True
+            return failed_count == 0
             
         except Exception as e:
             logger.error(f"清理扩展日志失败: {e}")
             return False
     
-    def clean_extension_cache(self) -> bool:
+    def clean_extension_cache(self, on_found: FoundCallback = None) -> bool:
         """清理扩展缓存"""
         try:
-            cache_dir = self.storage_paths['cache_dir']
+            cache_dir = self.cache_dir
             if not cache_dir.exists():
                 logger.info("缓存目录不存在，跳过清理")
                 return True
             
             cleaned_count = 0
-            for cache_file in cache_dir.rglob("*augment*"):
-                if cache_file.is_file():
-                    logger.info(f"清理缓存文件: {cache_file}")
-                    cache_file.unlink()
-                    cleaned_count += 1
-                elif cache_file.is_dir():
-                    logger.info(f"清理缓存目录: {cache_file}")
-                    shutil.rmtree(cache_file)
+            failed_count = 0
+            for entry in _scandir_recursive(cache_dir):
+                if "augment" not in entry.name.lower():
+                    continue
+                # 单个缓存项删除失败不中断整批清理
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        logger.debug(f"清理缓存目录: {entry.path}")
+                        _fast_rmtree(entry.path)
+                    elif entry.is_file():
+                        logger.debug(f"清理缓存文件: {entry.path}")
+                        os.unlink(entry.path)
+                    else:
+                        continue
                     cleaned_count += 1
+                    if on_found:
+                        on_found('cache', entry.path)
+                except OSError as e:
+                    logger.warning(f"删除缓存项失败: {entry.path}: {e}")
+                    failed_count += 1
             
             logger.info(f"扩展缓存清理完成，共清理 {cleaned_count} 个缓存项")
-            return True
+            return failed_count == 0
             
         except Exception as e:
             logger.error(f"清理扩展缓存失败: {e}")
@@ -258,34 +430,40 @@ class AugmentCleaner:
                 logger.info("SQLite 存储文件不存在，跳过清理")
                 return True
 
-            # 连接数据库
-            conn = sqlite3.connect(storage_db)
-            cursor = conn.cursor()
+            # 连接数据库（手动管理事务，所有删除在同一个事务中完成，只提交一次）
+            conn = sqlite3.connect(storage_db, isolation_level=None)
+            try:
+                cursor = conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
 
-            # 查找 Augment 相关的表和数据
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-            tables = cursor.fetchall()
+                # 查找 Augment 相关的表和数据
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+                target_tables = [name for (name,) in cursor.fetchall() if 'augment' in name.lower()]
 
-            cleaned_count = 0
-            for table in tables:
-                table_name = table[0]
-                if 'augment' in table_name.lower():
+                cleaned_count = 0
+                for table_name in target_tables:
                     logger.info(f"清理表: {table_name}")
-                    cursor.execute(f"DROP TABLE IF EXISTS {table_name}")
+                    quoted_name = table_name.replace('"', '""')
+                    cursor.execute(f'DROP TABLE IF EXISTS "{quoted_name}"')
                     cleaned_count += 1
 
-            # 清理可能包含 Augment 数据的通用表
-            try:
-                cursor.execute("DELETE FROM ItemTable WHERE key LIKE '%augment%'")
-                deleted_rows = cursor.rowcount
-                if deleted_rows > 0:
-                    logger.info(f"从 ItemTable 删除了 {deleted_rows} 行 Augment 数据")
-                    cleaned_count += deleted_rows
-            except sqlite3.OperationalError:
-                pass  # 表可能不存在
-
-            conn.commit()
-            conn.close()
+                # 清理可能包含 Augment 数据的通用表
+                try:
+                    cursor.execute("DELETE FROM ItemTable WHERE key LIKE ?", ("%augment%",))
+                    deleted_rows = cursor.rowcount
+                    if deleted_rows > 0:
+                        logger.info(f"从 ItemTable 删除了 {deleted_rows} 行 Augment 数据")
+                        cleaned_count += deleted_rows
+                except sqlite3.OperationalError:
+                    pass  # 表可能不存在
+
+                cursor.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            finally:
+                conn.close()
 
             logger.info(f"SQLite 存储清理完成，共清理 {cleaned_count} 项")
             return True
@@ -313,23 +491,25 @@ class AugmentCleaner:
             cleaned_count = 0
             for reg_path in registry_paths:
                 try:
-                    key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path, 0, winreg.KEY_ALL_ACCESS)
+                    key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path, 0, winreg.KEY_READ | winreg.KEY_WRITE)
+                    try:
+                        # 先枚举全部子键名，再统一删除，避免边枚举边删除导致索引移动
+                        subkey_names = []
+                        i = 0
+                        while True:
+                            try:
+                                subkey_names.append(winreg.EnumKey(key, i))
+                                i += 1
+                            except OSError:
+                                break
 
-                    # 枚举子键，查找 Augment 相关项
-                    i = 0
-                    while True:
-                        try:
-                            subkey_name = winreg.EnumKey(key, i)
+                        for subkey_name in subkey_names:
                             if 'augment' in subkey_name.lower():
                                 logger.info(f"清理注册表项: {reg_path}\\{subkey_name}")
                                 winreg.DeleteKey(key, subkey_name)
                                 cleaned_count += 1
-                            else:
-                                i += 1
-                        except WindowsError:
-                            break
-
-                    winreg.CloseKey(key)
+                    finally:
+                        winreg.CloseKey(key)
 
                 except FileNotFoundError:
                     continue  # 注册表路径不存在
@@ -346,101 +526,119 @@ class AugmentCleaner:
             logger.error(f"清理注册表失败: {e}")
             return False
 
-    def scan_augment_data(self) -> Dict[str, List[str]]:
+    @staticmethod
+    def new_scan_results() -> Dict[str, ScanCategory]:
+        """创建空的扫描结果（也用于 --clean --verbose 在清理时直接汇总）"""
+        return {
+            'global_storage': ScanCategory(),
+            'workspace_storage': ScanCategory(),
+            'user_settings': ScanCategory(),
+            'logs': ScanCategory(),
+            'cache': ScanCategory(),
+            'sqlite': ScanCategory(),
+            'registry': ScanCategory()
+        }
+
+    def scan_augment_data(self) -> Dict[str, ScanCategory]:
         """扫描所有 Augment 相关数据"""
         logger.info("开始扫描 Augment 相关数据...")
 
-        found_data = {
-            'global_storage': [],
-            'workspace_storage': [],
-            'user_settings': [],
-            'logs': [],
-            'cache': [],
-            'sqlite': [],
-            'registry': []
-        }
+        found_data = self.new_scan_results()
 
         # 扫描全局存储
-        global_storage = self.storage_paths['global_storage']
+        global_storage = self.global_storage
         if global_storage.exists():
-            for item in global_storage.rglob("*"):
-                found_data['global_storage'].append(str(item))
+            for entry in _scandir_recursive(global_storage):
+                found_data['global_storage'].add(entry.path)
 
         # 扫描工作区存储
-        workspace_root = self.storage_paths['workspace_storage_root']
+        workspace_root = self.workspace_storage_root
         if workspace_root.exists():
-            for workspace_dir in workspace_root.iterdir():
-                if workspace_dir.is_dir():
-                    augment_workspace = workspace_dir / self.extension_id
-                    if augment_workspace.exists():
-                        for item in augment_workspace.rglob("*"):
-                            found_data['workspace_storage'].append(str(item))
+            for _, augment_workspace in self._augment_workspace_dirs(workspace_root):
+                for entry in _scandir_recursive(augment_workspace):
+                    found_data['workspace_storage'].add(entry.path)
 
         # 扫描用户配置
-        settings_file = self.storage_paths['user_settings']
+        settings_file = self.user_settings
         if settings_file.exists():
             try:
-                with open(settings_file, 'r', encoding='utf-8') as f:
-                    settings = json.load(f)
-
-                for key in settings.keys():
-                    if any(augment_key in key for augment_key in self.augment_config_keys):
-                        found_data['user_settings'].append(f"{key}: {settings[key]}")
+                if ijson is not None:
+                    # 流式遍历顶层键值对，不构建完整的配置字典
+                    with open(settings_file, 'rb') as f:
+                        for key, value in ijson.kvitems(f, ''):
+                            if self._is_augment_config_key(key):
+                                found_data['user_settings'].add(f"{key}: {value}")
+                else:
+                    with open(settings_file, 'r', encoding='utf-8') as f:
+                        settings = json.load(f)
+
+                    for key in settings.keys():
+                        if self._is_augment_config_key(key):
+                            found_data['user_settings'].add(f"{key}: {settings[key]}")
             except Exception as e:
                 logger.warning(f"扫描用户配置时出错: {e}")
 
         # 扫描日志
-        logs_dir = self.storage_paths['logs_dir']
+        logs_dir = self.logs_dir
         if logs_dir.exists():
-            for log_file in logs_dir.rglob("*augment*"):
-                found_data['logs'].append(str(log_file))
+            for entry in _scandir_recursive(logs_dir):
+                if "augment" in entry.name.lower():
+                    found_data['logs'].add(entry.path)
 
         # 扫描缓存
-        cache_dir = self.storage_paths['cache_dir']
+        cache_dir = self.cache_dir
         if cache_dir.exists():
-            for cache_item in cache_dir.rglob("*augment*"):
-                found_data['cache'].append(str(cache_item))
+            for entry in _scandir_recursive(cache_dir):
+                if "augment" in entry.name.lower():
+                    found_data['cache'].add(entry.path)
 
         return found_data
 
-    def print_scan_results(self, found_data: Dict[str, List[str]]):
+    def print_scan_results(self, found_data: Dict[str, ScanCategory]):
         """打印扫描结果"""
         logger.info("=== Augment 数据扫描结果 ===")
 
         total_items = 0
-        for category, items in found_data.items():
-            if items:
-                logger.info(f"\n{category.upper()} ({len(items)} 项):")
-                for item in items[:10]:  # 只显示前10项
+        for category, found in found_data.items():
+            if found.total:
+                logger.info(f"\n{category.upper()} ({found.total} 项):")
+                for item in found.items:  # 只显示前 SCAN_PREVIEW_LIMIT 项
                     logger.info(f"  - {item}")
-                if len(items) > 10:
-                    logger.info(f"  ... 还有 {len(items) - 10} 项")
-                total_items += len(items)
+                if found.total > len(found.items):
+                    logger.info(f"  ... 还有 {found.total - len(found.items)} 项")
+                total_items += found.total
             else:
                 logger.info(f"\n{category.upper()}: 未找到相关数据")
 
         logger.info(f"\n总计找到 {total_items} 项 Augment 相关数据")
 
-    def full_clean(self, create_backup: bool = True) -> bool:
-        """执行完整清理"""
+    def full_clean(self, create_backup: bool = True, backup_strategy: str = 'link',
+                   on_found: FoundCallback = None) -> bool:
+        """执行完整清理（传入 on_found 时，清理过程中同时汇报找到并清理的条目，无需单独扫描）"""
         logger.info("开始执行 Augment 扩展完整清理...")
 
         # 创建备份
         if create_backup:
-            if not self.create_backup():
+            if not self.create_backup(backup_strategy):
                 logger.error("备份失败，终止清理操作")
                 return False
 
-        # 执行各项清理
+        # 执行各项清理（各项操作的路径互不相交，以 I/O 为主，并行执行）
         success = True
 
-        success &= self.clean_global_storage()
-        success &= self.clean_workspace_storage()
-        success &= self.clean_user_settings()
-        success &= self.clean_extension_logs()
-        success &= self.clean_extension_cache()
-        success &= self.clean_sqlite_storage()
-        success &= self.clean_registry_entries()
+        clean_steps = [
+            lambda: self.clean_global_storage(on_found),
+            lambda: self.clean_workspace_storage(on_found),
+            lambda: self.clean_user_settings(on_found),
+            lambda: self.clean_extension_logs(on_found),
+            lambda: self.clean_extension_cache(on_found),
+            self.clean_sqlite_storage,
+            self.clean_registry_entries,
+        ]
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(step) for step in clean_steps]
+            for future in futures:
+                success &= future.result()
 
         if success:
             logger.info("✅ Augment 扩展完整清理成功完成！")
@@ -462,21 +660,21 @@ class AugmentCleaner:
             # 恢复全局存储
             backup_global = backup_dir / "globalStorage"
             if backup_global.exists():
-                target_global = self.storage_paths['global_storage']
+                target_global = self.global_storage
                 if target_global.exists():
-                    shutil.rmtree(target_global)
+                    _fast_rmtree(target_global)
                 shutil.copytree(backup_global, target_global)
                 logger.info("已恢复全局存储")
 
             # 恢复工作区存储
             backup_workspace = backup_dir / "workspaceStorage"
             if backup_workspace.exists():
-                workspace_root = self.storage_paths['workspace_storage_root']
+                workspace_root = self.workspace_storage_root
                 for workspace_backup in backup_workspace.iterdir():
                     if workspace_backup.is_dir():
                         target_workspace = workspace_root / workspace_backup.name / self.extension_id
                         if target_workspace.exists():
-                            shutil.rmtree(target_workspace)
+                            _fast_rmtree(target_workspace)
                         target_workspace.parent.mkdir(parents=True, exist_ok=True)
                         shutil.copytree(workspace_backup / self.extension_id, target_workspace)
                         logger.info(f"已恢复工作区存储: {workspace_backup.name}")
@@ -484,7 +682,7 @@ class AugmentCleaner:
             # 恢复用户配置
             backup_settings = backup_dir / "settings.json"
             if backup_settings.exists():
-                target_settings = self.storage_paths['user_settings']
+                target_settings = self.user_settings
                 shutil.copy2(backup_settings, target_settings)
                 logger.info("已恢复用户配置")
 
@@ -506,6 +704,8 @@ def main():
   python augment_cleaner.py --scan                    # 扫描 Augment 数据
   python augment_cleaner.py --clean                   # 完整清理（自动备份）
   python augment_cleaner.py --clean --no-backup      # 完整清理（不备份）
+  python augment_cleaner.py --clean --move-backup    # 完整清理（将存储目录直接移动为备份）
+  python augment_cleaner.py --clean --verbose        # 完整清理，并输出清理掉的条目（无需先 --scan）
   python augment_cleaner.py --restore backup_path    # 从备份恢复
   python augment_cleaner.py --clean-global           # 只清理全局存储
   python augment_cleaner.py --clean-workspace        # 只清理工作区存储
@@ -515,6 +715,8 @@ def main():
     parser.add_argument('--scan', action='store_true', help='扫描 Augment 相关数据')
     parser.add_argument('--clean', action='store_true', help='执行完整清理')
     parser.add_argument('--no-backup', action='store_true', help='清理时不创建备份')
+    parser.add_argument('--move-backup', action='store_true', help='备份时直接移动存储目录，而不是复制')
+    parser.add_argument('--verbose', action='store_true', help='清理时输出清理掉的条目（与扫描结果格式相同）')
     parser.add_argument('--restore', type=str, help='从指定备份路径恢复')
     parser.add_argument('--clean-global', action='store_true', help='只清理全局存储')
     parser.add_argument('--clean-workspace', action='store_true', help='只清理工作区存储')
@@ -529,8 +731,9 @@ def main():
     # 检查是否有 VSCode 进程运行
     try:
         import psutil
-        vscode_processes = [p for p in psutil.process_iter(['pid', 'name']) if 'code' in p.info['name'].lower()]
-        if vscode_processes:
+        # 只获取进程名，找到第一个匹配的进程即停止遍历
+        vscode_running = any('code' in (p.info.get('name') or '').lower() for p in psutil.process_iter(attrs=['name']))
+        if vscode_running:
             logger.warning("检测到 VSCode 正在运行，建议先关闭 VSCode 再执行清理操作")
             response = input("是否继续？(y/N): ")
             if response.lower() != 'y':
@@ -547,7 +750,12 @@ def main():
 
     elif args.clean:
         create_backup = not args.no_backup
-        success = cleaner.full_clean(create_backup)
+        backup_strategy = 'move' if args.move_backup else 'link'
+        found_data = cleaner.new_scan_results() if args.verbose else None
+        on_found = (lambda category, item: found_data[category].add(item)) if args.verbose else None
+        success = cleaner.full_clean(create_backup, backup_strategy, on_found)
+        if found_data is not None:
+            cleaner.print_scan_results(found_data)
         if success:
             logger.info("清理完成！重启 VSCode 后 Augment 扩展将处于全新状态")
         else:
@@ -1,23 +1,23 @@
 import os
+import sys
 import json
 import shutil
-import platform
+
+if sys.platform == "win32":
+    _VSCODE_SETTINGS_PATH = os.path.expandvars(r"%APPDATA%\Code\User\settings.json")
+    _EXTENSIONS_DIR = os.path.expandvars(r"%USERPROFILE%\.vscode\extensions")
+elif sys.platform == "darwin":
+    _VSCODE_SETTINGS_PATH = os.path.expanduser("~/Library/Application Support/Code/User/settings.json")
+    _EXTENSIONS_DIR = os.path.expanduser("~/.vscode/extensions")
+else:
+    _VSCODE_SETTINGS_PATH = os.path.expanduser("~/.config/Code/User/settings.json")
+    _EXTENSIONS_DIR = os.path.expanduser("~/.vscode/extensions")
 
 def get_vscode_settings_path():
-    system = platform.system()
-    if system == "Windows":
-        return os.path.expandvars(r"%APPDATA%\Code\User\settings.json")
-    elif system == "Darwin":
-        return os.path.expanduser("~/Library/Application Support/Code/User/settings.json")
-    else:
-        return os.path.expanduser("~/.config/Code/User/settings.json")
+    return _VSCODE_SETTINGS_PATH
 
 def get_extensions_dir():
-    system = platform.system()
-    if system == "Windows":
-        return os.path.expandvars(r"%USERPROFILE%\.vscode\extensions")
-    else:
-        return os.path.expanduser("~/.vscode/extensions")
+    return _EXTENSIONS_DIR
 
 def clear_api_token(settings_path):
     print(f"检查 VS Code 设置文件: {settings_path}")
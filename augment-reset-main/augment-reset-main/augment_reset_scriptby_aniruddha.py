@@ -1,32 +1,53 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import sys
 import shutil
 import subprocess
 import platform
 import json
 import sqlite3
+import threading
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
 # Windows registry import will be done conditionally later
 
+# psutil is optional; without it VS Code is closed with taskkill/pkill
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Process names of the VS Code main and helper processes
+VSCODE_PROCESS_NAMES = {"Code.exe", "Code", "code", "Code Helper"}
+
 class AugmentResetTool:
     def __init__(self):
         self.system = platform.system()
         self.home = Path.home()
+        self.paths = self.get_vscode_paths()
         self.removed_items = []
         self.errors = []
+        # Reset steps run on worker threads, so logging and the result lists are guarded
+        self._log_lock = threading.Lock()
+        # Every Augment name pattern (augment, augmentcode, augment-code, augment.code,
+        # augment-ai, augmentai) contains "augment", so one case-insensitive search covers them all
+        self._augment_re = re.compile("augment", re.IGNORECASE)
         
     def log_success(self, message):
-        print(f"✓ {message}")
-        self.removed_items.append(message)
+        with self._log_lock:
+            print(f"✓ {message}")
+            self.removed_items.append(message)
     
     def log_error(self, message):
-        print(f"✗ {message}")
-        self.errors.append(message)
+        with self._log_lock:
+            print(f"✗ {message}")
+            self.errors.append(message)
     
     def log_info(self, message):
-        print(f"ℹ {message}")
+        with self._log_lock:
+            print(f"ℹ {message}")
     
     def get_vscode_paths(self):
         """Get VS Code configuration paths for different OS"""
@@ -57,6 +78,13 @@ class AugmentResetTool:
     
     def close_vscode(self):
         """Close VS Code processes"""
+        if psutil is not None:
+            try:
+                self._close_vscode_psutil()
+                self.log_success("Closed VS Code processes")
+                return
+            except Exception as e:
+                self.log_info(f"psutil could not close VS Code ({e}), falling back to system command")
         try:
             if self.system == "Windows":
                 subprocess.run(["taskkill", "/F", "/IM", "Code.exe"], 
@@ -68,38 +96,60 @@ class AugmentResetTool:
         except Exception as e:
             self.log_error(f"Error closing VS Code: {e}")
     
+    def _close_vscode_psutil(self):
+        """Terminate VS Code processes in-process instead of spawning taskkill/pkill"""
+        targets = []
+        for proc in psutil.process_iter(['name', 'exe']):
+            name = proc.info['name'] or ""
+            exe = proc.info['exe'] or ""
+            if name in VSCODE_PROCESS_NAMES or "Visual Studio Code" in exe:
+                try:
+                    proc.terminate()
+                    targets.append(proc)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+        # Give processes a moment to exit, then kill whatever is left
+        _, alive = psutil.wait_procs(targets, timeout=3)
+        for proc in alive:
+            try:
+                proc.kill()
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+    
     def remove_augment_extensions(self):
         """Remove Augment-related extensions"""
-        paths = self.get_vscode_paths()
+        paths = self.paths
         extensions_dir = paths["extensions"]
         
         if not extensions_dir.exists():
             self.log_info("Extensions directory not found")
             return
         
-        # Common Augment extension patterns
-        augment_patterns = [
-            "augment",
-            "augmentcode",
-            "augment-code",
-            "augment.code",
-            "augment-ai",
-            "augmentai"
-        ]
         print(extensions_dir)
-        for item in extensions_dir.iterdir():
-            if item.is_dir():
-                item_name = item.name.lower()
-                if any(pattern in item_name for pattern in augment_patterns):
-                    try:
-                        shutil.rmtree(item)
-                        self.log_success(f"Removed extension: {item.name}")
-                    except Exception as e:
-                        self.log_error(f"Error removing {item.name}: {e}")
+        with os.scandir(extensions_dir) as entries:
+            victims = [entry for entry in entries
+                       if entry.is_dir(follow_symlinks=False) and self._augment_re.search(entry.name)]
+        if not victims:
+            return
+        
+        def remove(path):
+            try:
+                shutil.rmtree(path)
+            except Exception as e:
+                return e
+            return None
+        
+        # Each extension is a tree of many small files; remove them concurrently
+        with ThreadPoolExecutor(max_workers=min(8, len(victims))) as executor:
+            for entry, e in zip(victims, executor.map(remove, [v.path for v in victims])):
+                if e is None:
+                    self.log_success(f"Removed extension: {entry.name}")
+                else:
+                    self.log_error(f"Error removing {entry.name}: {e}")
     
     def clean_vscode_settings(self):
         """Clean VS Code settings and configurations"""
-        paths = self.get_vscode_paths()
+        paths = self.paths
         
         # Files to clean
         files_to_clean = [
@@ -122,26 +172,22 @@ class AugmentResetTool:
     def clean_json_file(self, file_path):
         """Clean Augment-related entries from JSON files"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            data = json.loads(file_path.read_bytes())
             
-            original_data = json.dumps(data, sort_keys=True)
+            changed = False
             
             # Remove Augment-related keys
             if isinstance(data, dict):
-                keys_to_remove = []
-                for key in data.keys():
-                    if 'augment' in key.lower():
-                        keys_to_remove.append(key)
+                keys_to_remove = [key for key in data if 'augment' in key.lower()]
                 
                 for key in keys_to_remove:
                     del data[key]
                     self.log_success(f"Removed setting: {key}")
+                changed = bool(keys_to_remove)
             
             # Write back if changed
-            if json.dumps(data, sort_keys=True) != original_data:
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2)
+            if changed:
+                file_path.write_bytes(json.dumps(data, indent=2).encode('utf-8'))
                 self.log_success(f"Cleaned: {file_path.name}")
         
         except Exception as e:
@@ -151,63 +197,112 @@ class AugmentResetTool:
         """Clean Augment-related entries from SQLite database"""
         try:
             conn = sqlite3.connect(file_path)
-            cursor = conn.cursor()
-            
-            # Get all table names
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = cursor.fetchall()
-            
-            for table in tables:
-                table_name = table[0]
+            try:
+                self._clean_vscdb_tables(conn.cursor())
+            finally:
+                conn.close()
+            self.log_success(f"Cleaned database: {file_path.name}")
+        
+        except Exception as e:
+            self.log_error(f"Error cleaning database {file_path}: {e}")
+    
+    def _clean_vscdb_tables(self, cursor, schema="main"):
+        """Remove Augment-related rows from every key/value table of an open (or attached) database"""
+        # Get all table names, keeping only tables that have both key and value columns
+        cursor.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type='table';")
+        table_names = []
+        for (table_name,) in cursor.fetchall():
+            quoted_name = '"' + table_name.replace('"', '""') + '"'
+            columns = {row[1] for row in cursor.execute(f"PRAGMA {schema}.table_info({quoted_name})")}
+            if {'key', 'value'} <= columns:
+                table_names.append((table_name, f"{schema}.{quoted_name}"))
+        
+        # Clean every table inside one transaction so the file is only synced once
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            for table_name, quoted_name in table_names:
                 try:
-                    # Remove rows containing 'augment' in key/value
-                    cursor.execute(f"DELETE FROM {table_name} WHERE key LIKE '%augment%' OR value LIKE '%augment%'")
+                    # Remove rows containing 'augment' in key/value: the key pass first, then the
+                    # value scan only if a LIMIT 1 probe shows any matching value is left
+                    cursor.execute(f"DELETE FROM {quoted_name} WHERE key LIKE '%augment%'")
                     deleted = cursor.rowcount
+                    cursor.execute(f"SELECT 1 FROM {quoted_name} WHERE value LIKE '%augment%' LIMIT 1")
+                    if cursor.fetchone():
+                        cursor.execute(f"DELETE FROM {quoted_name} WHERE value LIKE '%augment%'")
+                        deleted += cursor.rowcount
                     if deleted > 0:
                         self.log_success(f"Removed {deleted} entries from {table_name}")
                 except Exception as e:
                     self.log_error(f"Error cleaning table {table_name}: {e}")
-            
-            conn.commit()
-            conn.close()
-            self.log_success(f"Cleaned database: {file_path.name}")
-        
-        except Exception as e:
-            self.log_error(f"Error cleaning database {file_path}: {e}")
+            cursor.connection.commit()
+        except Exception:
+            cursor.connection.rollback()
+            raise
     
     def clean_workspace_storage(self):
         """Clean workspace storage"""
-        paths = self.get_vscode_paths()
+        paths = self.paths
         workspace_dir = paths["workspaceStorage"]
         
         if not workspace_dir.exists():
             return
         
-        for item in workspace_dir.iterdir():
-            if item.is_dir():
-                try:
-                    # Check if workspace contains Augment data
-                    state_file = item / "state.vscdb"
+        # Check which workspaces contain a state database
+        state_files = []
+        with os.scandir(workspace_dir) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    state_file = Path(entry.path) / "state.vscdb"
                     if state_file.exists():
-                        self.clean_vscdb_file(state_file)
+                        state_files.append(state_file)
+        
+        if not state_files:
+            return
+        
+        # Reuse one connection for all workspaces, attaching each database in turn
+        conn = sqlite3.connect(":memory:")
+        try:
+            cursor = conn.cursor()
+            for state_file in state_files:
+                try:
+                    cursor.execute("ATTACH DATABASE ? AS ws", (str(state_file),))
+                    try:
+                        self._clean_vscdb_tables(cursor, "ws")
+                    finally:
+                        cursor.execute("DETACH DATABASE ws")
+                    self.log_success(f"Cleaned database: {state_file.name}")
                 except Exception as e:
-                    self.log_error(f"Error cleaning workspace {item.name}: {e}")
+                    self.log_error(f"Error cleaning database {state_file}: {e}")
+        finally:
+            conn.close()
+    
+    def _purge_matching(self, dir_path, label):
+        """Remove entries of a directory whose name mentions Augment"""
+        # Collect matches first: files are unlinked directly, directory trees are removed on a thread pool
+        dir_entries = []
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if self._augment_re.search(entry.name):
+                    if entry.is_dir(follow_symlinks=False):
+                        dir_entries.append(entry)
+                    else:
+                        os.unlink(entry.path)
+                        self.log_success(f"Removed {label}: {entry.name}")
+        
+        if dir_entries:
+            with ThreadPoolExecutor(max_workers=min(8, len(dir_entries))) as executor:
+                for entry, _ in zip(dir_entries, executor.map(shutil.rmtree, [e.path for e in dir_entries])):
+                    self.log_success(f"Removed {label}: {entry.name}")
     
     def clean_cache_and_logs(self):
         """Clean cache and log files"""
-        paths = self.get_vscode_paths()
+        paths = self.paths
         
         # Clean cache
         cache_dir = paths["cache"]
         if cache_dir.exists():
             try:
-                for item in cache_dir.iterdir():
-                    if 'augment' in item.name.lower():
-                        if item.is_dir():
-                            shutil.rmtree(item)
-                        else:
-                            item.unlink()
-                        self.log_success(f"Removed cache: {item.name}")
+                self._purge_matching(cache_dir, "cache")
             except Exception as e:
                 self.log_error(f"Error cleaning cache: {e}")
         
@@ -215,13 +310,7 @@ class AugmentResetTool:
         logs_dir = paths["logs"]
         if logs_dir.exists():
             try:
-                for item in logs_dir.iterdir():
-                    if 'augment' in item.name.lower():
-                        if item.is_dir():
-                            shutil.rmtree(item)
-                        else:
-                            item.unlink()
-                        self.log_success(f"Removed log: {item.name}")
+                self._purge_matching(logs_dir, "log")
             except Exception as e:
                 self.log_error(f"Error cleaning logs: {e}")
     
@@ -245,13 +334,7 @@ class AugmentResetTool:
         for temp_dir in temp_dirs:
             if temp_dir.exists():
                 try:
-                    for item in temp_dir.iterdir():
-                        if 'augment' in item.name.lower():
-                            if item.is_dir():
-                                shutil.rmtree(item)
-                            else:
-                                item.unlink()
-                            self.log_success(f"Removed temp file: {item.name}")
+                    self._purge_matching(temp_dir, "temp file")
                 except Exception as e:
                     self.log_error(f"Error cleaning temp directory {temp_dir}: {e}")
     
@@ -320,32 +403,32 @@ class AugmentResetTool:
         self.log_info("Step 1: Closing VS Code...")
         self.close_vscode()
         
-        # Step 2: Remove extensions
-        self.log_info("Step 2: Removing Augment extensions...")
-        self.remove_augment_extensions()
-        
-        # Step 3: Clean settings
-        self.log_info("Step 3: Cleaning VS Code settings...")
-        self.clean_vscode_settings()
-        
-        # Step 4: Clean workspace storage
-        self.log_info("Step 4: Cleaning workspace storage...")
-        self.clean_workspace_storage()
-        
-        # Step 5: Clean cache and logs
-        self.log_info("Step 5: Cleaning cache and logs...")
-        self.clean_cache_and_logs()
-        
-        # Step 6: Clean system temp
-        self.log_info("Step 6: Cleaning system temporary files...")
-        self.clean_system_temp()
-        
+        # Steps 2-7 touch disjoint files and directories and are I/O bound, so they run concurrently
+        steps = [
+            ("Step 2: Removing Augment extensions...", self.remove_augment_extensions),
+            ("Step 3: Cleaning VS Code settings...", self.clean_vscode_settings),
+            ("Step 4: Cleaning workspace storage...", self.clean_workspace_storage),
+            ("Step 5: Cleaning cache and logs...", self.clean_cache_and_logs),
+            ("Step 6: Cleaning system temporary files...", self.clean_system_temp),
+        ]
         # Step 7: Clean registry (Windows only)
         if self.system == "Windows":
-            self.log_info("Step 7: Cleaning Windows registry...")
-            self.clean_registry_windows()
+            steps.append(("Step 7: Cleaning Windows registry...", self.clean_registry_windows))
+        
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = {}
+            for label, step in steps:
+                self.log_info(label)
+                futures[executor.submit(step)] = label
+            for future in as_completed(futures):
+                label = futures[future]
+                try:
+                    future.result()
+                    self.log_info(f"Done: {label.rstrip('.')}")
+                except Exception as e:
+                    self.log_error(f"{label.rstrip('.')} failed: {e}")
         
-        # Step 8: Reset network cache
+        # Step 8: Reset network cache (kept serial, sudo may prompt for a password)
         self.log_info("Step 8: Resetting network cache...")
         self.reset_network_cache()
         
@@ -9,6 +9,8 @@ import json
 import sqlite3
 import uuid
 import shutil
+import secrets
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 
@@ -17,36 +19,36 @@ try:
     from colorama import init, Fore, Style
     init()  # Initialize colorama for Windows support
     
-    def info(msg: str) -> None:
-        """Print an info message in blue"""
-        print(f"{Fore.BLUE}[INFO]{Style.RESET_ALL} {msg}")
-    
-    def success(msg: str) -> None:
-        """Print a success message in green"""
-        print(f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} {msg}")
-    
-    def warning(msg: str) -> None:
-        """Print a warning message in yellow"""
-        print(f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} {msg}")
-    
-    def error(msg: str) -> None:
-        """Print an error message in red"""
-        print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {msg}")
+    # Message prefixes are formatted once at import
+    _PREFIX_INFO = f"{Fore.BLUE}[INFO]{Style.RESET_ALL} "
+    _PREFIX_SUCCESS = f"{Fore.GREEN}[SUCCESS]{Style.RESET_ALL} "
+    _PREFIX_WARNING = f"{Fore.YELLOW}[WARNING]{Style.RESET_ALL} "
+    _PREFIX_ERROR = f"{Fore.RED}[ERROR]{Style.RESET_ALL} "
         
 except ImportError:
     # Fallback if colorama is not installed
-    def info(msg: str) -> None:
-        print(f"[INFO] {msg}")
-    
-    def success(msg: str) -> None:
-        print(f"[SUCCESS] {msg}")
-    
-    def warning(msg: str) -> None:
-        print(f"[WARNING] {msg}")
-    
-    def error(msg: str) -> None:
-        print(f"[ERROR] {msg}")
+    _PREFIX_INFO = "[INFO] "
+    _PREFIX_SUCCESS = "[SUCCESS] "
+    _PREFIX_WARNING = "[WARNING] "
+    _PREFIX_ERROR = "[ERROR] "
+
+def info(msg: str) -> None:
+    """Print an info message in blue"""
+    print(_PREFIX_INFO + msg)
+
+def success(msg: str) -> None:
+    """Print a success message in green"""
+    print(_PREFIX_SUCCESS + msg)
+
+def warning(msg: str) -> None:
+    """Print a warning message in yellow"""
+    print(_PREFIX_WARNING + msg)
+
+def error(msg: str) -> None:
+    """Print an error message in red"""
+    print(_PREFIX_ERROR + msg)
 
+@lru_cache(maxsize=1)
 def get_vscode_paths() -> Dict[str, Path]:
     """
     Get VS Code paths based on the operating system
@@ -97,14 +99,47 @@ def backup_file(file_path: Path) -> Path:
         sys.exit(1)
         
     backup_path = Path(f"{file_path}.backup")
+    # Hardlinks are not used: both storage.json and the SQLite database are
+    # modified in place afterwards, which would change a linked backup too
+    if file_path.suffix == ".vscdb" and _backup_sqlite(file_path, backup_path):
+        success(f"Created backup at: {backup_path}")
+        return backup_path
+    
     shutil.copy2(file_path, backup_path)
     success(f"Created backup at: {backup_path}")
     
     return backup_path
 
+def _backup_sqlite(db_path: Path, backup_path: Path) -> bool:
+    """
+    Snapshot a SQLite database with VACUUM INTO
+    
+    Unlike a file copy this also captures changes still in the WAL file and
+    writes a compacted copy in a single pass.
+    
+    Args:
+        db_path: Path to the database to backup
+        backup_path: Path of the snapshot to create
+        
+    Returns:
+        True if the snapshot was written, False if a plain copy is needed
+    """
+    try:
+        if backup_path.exists():
+            backup_path.unlink()  # VACUUM INTO refuses to overwrite
+        conn = sqlite3.connect(str(db_path))
+        try:
+            conn.execute("VACUUM INTO ?", (str(backup_path),))
+        finally:
+            conn.close()
+        return True
+    except (sqlite3.Error, OSError):
+        # VACUUM INTO needs SQLite 3.27+; older versions fall back to copying
+        return False
+
 def generate_machine_id() -> str:
     """Generate a random 64-character hex string for machineId"""
-    return uuid.uuid4().hex + uuid.uuid4().hex
+    return secrets.token_hex(32)
 
 def generate_device_id() -> str:
     """Generate a random UUID v4 for devDeviceId"""
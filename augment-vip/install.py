@@ -14,8 +14,10 @@ import shutil
 import argparse
 from pathlib import Path
 
+IS_WINDOWS = platform.system() == "Windows"
+
 # Console colors (basic version without colorama dependency)
-if platform.system() == "Windows":
+if IS_WINDOWS:
     # Windows doesn't support ANSI colors in all terminals
     BLUE = ""
     GREEN = ""
@@ -29,21 +31,27 @@ else:
     RED = "\033[31m"
     RESET = "\033[0m"
 
+# Message prefixes are formatted once at import
+PREFIX_INFO = f"{BLUE}[INFO]{RESET} "
+PREFIX_SUCCESS = f"{GREEN}[SUCCESS]{RESET} "
+PREFIX_WARNING = f"{YELLOW}[WARNING]{RESET} "
+PREFIX_ERROR = f"{RED}[ERROR]{RESET} "
+
 def info(msg):
     """Print an info message"""
-    print(f"{BLUE}[INFO]{RESET} {msg}")
+    print(PREFIX_INFO + msg)
 
 def success(msg):
     """Print a success message"""
-    print(f"{GREEN}[SUCCESS]{RESET} {msg}")
+    print(PREFIX_SUCCESS + msg)
 
 def warning(msg):
     """Print a warning message"""
-    print(f"{YELLOW}[WARNING]{RESET} {msg}")
+    print(PREFIX_WARNING + msg)
 
 def error(msg):
     """Print an error message"""
-    print(f"{RED}[ERROR]{RESET} {msg}")
+    print(PREFIX_ERROR + msg)
 
 def check_python_version():
     """Check if Python version is 3.6 or higher"""
@@ -66,14 +74,14 @@ def create_venv(venv_path):
 
 def get_venv_python(venv_path):
     """Get the path to the Python executable in the virtual environment"""
-    if platform.system() == "Windows":
+    if IS_WINDOWS:
         return venv_path / "Scripts" / "python.exe"
     else:
         return venv_path / "bin" / "python"
 
 def get_venv_pip(venv_path):
     """Get the path to the pip executable in the virtual environment"""
-    if platform.system() == "Windows":
+    if IS_WINDOWS:
         return venv_path / "Scripts" / "pip.exe"
     else:
         return venv_path / "bin" / "pip"
@@ -95,7 +103,7 @@ def install_package(venv_path, package_path="."):
 
 def run_command(venv_path, command):
     """Run a command in the virtual environment"""
-    if platform.system() == "Windows":
+    if IS_WINDOWS:
         script_path = venv_path / "Scripts" / f"{command}.exe"
     else:
         script_path = venv_path / "bin" / command
@@ -149,7 +157,7 @@ def main():
         run_command(venv_path, "augment-vip modify-ids")
 
     # Print usage information
-    if platform.system() == "Windows":
+    if IS_WINDOWS:
         cmd_path = f"{venv_path}\\Scripts\\augment-vip"
     else:
         cmd_path = f"{venv_path}/bin/augment-vip"